@@ -0,0 +1,102 @@
+"""
+Benchmark du rapprochement en flux (payments.reconciliation).
+
+Génère un rapport CSV de N lignes (5 millions par défaut), alimente une base
+SQLite temporaire avec une partie des transactions correspondantes (avec des
+écarts de montant et de statut), puis mesure le débit et la mémoire maximale.
+
+    python benchmarks/reconciliation.py --lines 5000000 --db-rows 200000
+"""
+import argparse
+import csv
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+
+def max_rss_mb():
+    # ru_maxrss est en kilo-octets sous Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_report(path, lines):
+    with open(path, 'w', newline='', encoding='utf-8') as report:
+        writer = csv.writer(report)
+        writer.writerow(['id', 'tx_ref', 'amount', 'currency', 'status'])
+        for index in range(lines):
+            writer.writerow([100000000 + index, f"FLW-BENCH{index:012d}", '100.00', 'USD', 'successful'])
+
+
+def seed_transactions(rows):
+    from decimal import Decimal
+
+    from payments.models import PaymentTransaction
+
+    batch = []
+    for index in range(rows):
+        batch.append(PaymentTransaction(
+            transaction_reference=f"FLW-BENCH{index:012d}",
+            flutterwave_transaction_id=str(100000000 + index),
+            amount=Decimal('100.00') if index % 50 else Decimal('99.00'),
+            currency='USD',
+            status=(
+                PaymentTransaction.TransactionStatus.SUCCESSFUL
+                if index % 20 else PaymentTransaction.TransactionStatus.PENDING
+            ),
+        ))
+        if len(batch) == 5000:
+            PaymentTransaction.objects.bulk_create(batch)
+            batch = []
+    PaymentTransaction.objects.bulk_create(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lines', type=int, default=5_000_000)
+    parser.add_argument('--db-rows', type=int, default=200_000)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--repair', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        from django.conf import settings
+
+        settings.DATABASES['default']['NAME'] = os.path.join(workdir, 'bench.sqlite3')
+
+        import django
+        from django.core.management import call_command
+
+        django.setup()
+        call_command('migrate', verbosity=0)
+
+        from payments.reconciliation import Reconciler, iter_csv_records
+
+        report_path = os.path.join(workdir, 'report.csv')
+        started = time.perf_counter()
+        write_report(report_path, args.lines)
+        seed_transactions(min(args.db_rows, args.lines))
+        print(f"Préparation: {time.perf_counter() - started:.1f}s "
+              f"({os.path.getsize(report_path) / 1024 ** 2:.0f} Mo)")
+
+        rss_before = max_rss_mb()
+        reconciler = Reconciler(chunk_size=args.chunk_size, repair=args.repair)
+        started = time.perf_counter()
+        with open(report_path, newline='', encoding='utf-8') as report:
+            mismatches = sum(1 for _ in reconciler.run(iter_csv_records(report)))
+        elapsed = time.perf_counter() - started
+
+        summary = reconciler.summary
+        print(f"Lignes: {summary.records} en {elapsed:.1f}s ({summary.records / elapsed:,.0f} lignes/s)")
+        print(f"Écarts: {mismatches} {summary.mismatches_by_field} | corrigées: {summary.repaired}")
+        print(f"Mémoire max: {max_rss_mb():.0f} Mo (avant rapprochement: {rss_before:.0f} Mo)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Schéma OpenAPI précalculé.
+
+Le schéma est généré une seule fois par la commande ``generate_openapi_schema``
+puis servi depuis le disque (gardé en mémoire) avec un ETag. drf_yasg n'est
+importé qu'à la génération ou lorsque l'interface Swagger/ReDoc est activée.
+"""
+import datetime
+import hashlib
+import logging
+import os
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_safe
+
+logger = logging.getLogger('payments')
+
+SCHEMA_FORMATS = {
+    '.json': ('schema.json', 'application/json'),
+    '.yaml': ('schema.yaml', 'application/yaml'),
+}
+
+API_INFO = {
+    'title': "Flutterwave API",
+    'default_version': 'v1',
+    'description': "Test description",
+    'terms_of_service': "https://www.google.com/policies/terms/",
+    'contact': {'email': "contact@snippets.local"},
+    'license': {'name': "BSD License"},
+}
+
+
+def get_api_info():
+    """Construit l'objet ``openapi.Info`` (import paresseux de drf_yasg)."""
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        **{
+            **API_INFO,
+            'contact': openapi.Contact(**API_INFO['contact']),
+            'license': openapi.License(**API_INFO['license']),
+        }
+    )
+
+
+@lru_cache(maxsize=None)
+def get_schema_view():
+    """Construit la vue drf_yasg utilisée par Swagger UI et ReDoc."""
+    from drf_yasg.views import get_schema_view as yasg_schema_view
+    from rest_framework import permissions
+
+    return yasg_schema_view(
+        get_api_info(),
+        url=settings.OPENAPI_SCHEMA_URL,
+        public=True,
+        permission_classes=(permissions.AllowAny,),
+    )
+
+
+def generate_schema(schema_format):
+    """
+    Génère le schéma en introspectant les vues et les serialiseurs.
+
+    Args:
+        schema_format (str): '.json' ou '.yaml'
+
+    Returns:
+        bytes: Schéma encodé
+    """
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+
+    generator = get_schema_view().generator_class(
+        get_api_info(), url=settings.OPENAPI_SCHEMA_URL
+    )
+    schema = generator.get_schema(request=None, public=True)
+    codec_class = OpenAPICodecJson if schema_format == '.json' else OpenAPICodecYaml
+    return codec_class([]).encode(schema)
+
+
+def schema_path(schema_format):
+    filename, _ = SCHEMA_FORMATS[schema_format]
+    return os.path.join(settings.OPENAPI_SCHEMA_DIR, filename)
+
+
+class _CachedSchema:
+    __slots__ = ('body', 'etag', 'mtime')
+
+    def __init__(self, body, mtime):
+        self.body = body
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.mtime = mtime
+
+    @property
+    def last_modified(self):
+        if self.mtime is None:
+            return None
+        return datetime.datetime.fromtimestamp(self.mtime, tz=datetime.timezone.utc)
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load_schema(schema_format):
+    """
+    Retourne le schéma depuis la mémoire, rechargé si le fichier a changé.
+
+    Si aucun fichier n'a été généré, le schéma est calculé une seule fois
+    dans le processus lorsque OPENAPI_SCHEMA_GENERATE_ON_MISS est actif.
+
+    Returns:
+        _CachedSchema | None: Schéma en cache, ou None s'il est indisponible
+    """
+    path = schema_path(schema_format)
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        mtime = None
+
+    cached = _cache.get(schema_format)
+    if cached is not None and cached.mtime == mtime:
+        return cached
+
+    with _cache_lock:
+        cached = _cache.get(schema_format)
+        if cached is not None and cached.mtime == mtime:
+            return cached
+
+        if mtime is not None:
+            with open(path, 'rb') as schema_file:
+                cached = _CachedSchema(schema_file.read(), mtime)
+        elif settings.OPENAPI_SCHEMA_GENERATE_ON_MISS:
+            logger.warning("Schéma OpenAPI absent (%s), génération en mémoire", path)
+            cached = _CachedSchema(generate_schema(schema_format), None)
+        else:
+            return None
+
+        _cache[schema_format] = cached
+        return cached
+
+
+def _get_schema_or_404(schema_format):
+    if schema_format not in SCHEMA_FORMATS:
+        raise Http404
+    cached = load_schema(schema_format)
+    if cached is None:
+        raise Http404("Schéma OpenAPI non généré")
+    return cached
+
+
+@require_safe
+@condition(
+    etag_func=lambda request, format: _get_schema_or_404(format).etag,
+    last_modified_func=lambda request, format: _get_schema_or_404(format).last_modified,
+)
+def schema_file_view(request, format):
+    """
+    Sert le schéma précalculé, sans réintrospection des vues à chaque requête.
+    """
+    cached = _get_schema_or_404(format)
+    _, content_type = SCHEMA_FORMATS[format]
+    response = HttpResponse(cached.body, content_type=content_type)
+    patch_cache_control(response, public=True, max_age=settings.OPENAPI_SCHEMA_MAX_AGE)
+    return response
@@ -1,4 +1,5 @@
-from decouple import config as decouple_config
+
+from decouple import Csv, config as decouple_config
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -29,7 +30,6 @@ INSTALLED_APPS = [
     
     'rest_framework',
     'django_filters',
-    'drf_yasg',
     'payments',
 ]
 
@@ -74,6 +74,22 @@ DATABASES = {
     }
 }
 
+# Sharding des PaymentTransaction par utilisateur (voir payments/sharding.py).
+# Liste ordonnée des bases qui reçoivent les nouveaux utilisateurs ; on ne peut
+# qu'ajouter des bases en fin de liste (leur rang est encodé dans les références).
+# Vide : pas de sharding, tout reste dans 'default'.
+# Chaque base se migre avec : python manage.py migrate --database <base>
+# Tests avec deux bases de shard : python manage.py test --settings=config.test_settings
+PAYMENTS_SHARDS = decouple_config('PAYMENTS_SHARDS', default='', cast=Csv())
+for shard in PAYMENTS_SHARDS:
+    # Bases SQLite locales par défaut ; en production, déclarer les bases ici
+    DATABASES.setdefault(shard, {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'{shard}.sqlite3',
+    })
+
+DATABASE_ROUTERS = ['payments.routers.ShardRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -129,24 +145,45 @@ REST_FRAMEWORK = {
     ]
 }            
 
-# LOGGING = {
-#     'version': 1,
-#     'disable_existing_loggers': False,
-#     'handlers': {
-#         'payments_webhook': {
-#             'level': 'INFO',
-#             'class': 'logging.FileHandler',
-#             'filename': '/path/to/logs/payments_webhook.log',
-#         },
-#     },
-#     'loggers': {
-#         'payments_webhook': {
-#             'handlers': ['payments_webhook'],
-#             'level': 'INFO',
-#             'propagate': True,
-#         },
-#     },
-# }
+# Journalisation asynchrone (file bornée), JSON, masquage des secrets et
+# échantillonnage des erreurs répétées pour le logger "payments" (voir payments/log.py)
+PAYMENTS_LOG_LEVEL = decouple_config('PAYMENTS_LOG_LEVEL', default='INFO')
+PAYMENTS_LOG_FILE = decouple_config('PAYMENTS_LOG_FILE', default='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'payments_json': {
+            '()': 'payments.log.RedactingJsonFormatter',
+        },
+    },
+    'filters': {
+        'payments_error_sampling': {
+            '()': 'payments.log.ErrorSamplingFilter',
+            'burst': decouple_config('PAYMENTS_LOG_SAMPLING_BURST', default=10, cast=int),
+            'interval': decouple_config('PAYMENTS_LOG_SAMPLING_INTERVAL', default=60, cast=int),
+        },
+    },
+    'handlers': {
+        'payments': {
+            # '()' et non 'class' : voir payments.log.AsyncQueueHandler
+            '()': 'payments.log.AsyncQueueHandler',
+            'formatter': 'payments_json',
+            'filters': ['payments_error_sampling'],
+            'queue_size': decouple_config('PAYMENTS_LOG_QUEUE_SIZE', default=10000, cast=int),
+            'target': 'logging.handlers.WatchedFileHandler' if PAYMENTS_LOG_FILE else 'logging.StreamHandler',
+            'target_kwargs': {'filename': PAYMENTS_LOG_FILE} if PAYMENTS_LOG_FILE else {},
+        },
+    },
+    'loggers': {
+        'payments': {
+            'handlers': ['payments'],
+            'level': PAYMENTS_LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
 
 
 #CONFIGURATION DE FLUTTERWAVE POUR LES PAIEMENTS EN LIGNES 
@@ -155,4 +192,67 @@ FLUTTERWAVE_PUBLIC_KEY = decouple_config('FLUTTERWAVE_PUBLIC_KEY')
 FLUTTERWAVE_SECRET_KEY = decouple_config('FLUTTERWAVE_SECRET_KEY')
 FLUTTERWAVE_ENCRYPTION_KEY = decouple_config('FLUTTERWAVE_ENCRYPTION_KEY')
 FLUTTERWAVE_BASE_URL = decouple_config('FLUTTERWAVE_BASE_URL')
-FLUTTERWAVE_REDIRECT_URL = decouple_config('FLUTTERWAVE_PUBLIC_KEY')
\ No newline at end of file
+FLUTTERWAVE_REDIRECT_URL = decouple_config('FLUTTERWAVE_PUBLIC_KEY')
+FLUTTERWAVE_TIMEOUT = decouple_config('FLUTTERWAVE_TIMEOUT', default=30, cast=int)
+# Nombre maximal d'appels simultanés vers Flutterwave lors des opérations groupées
+FLUTTERWAVE_MAX_CONCURRENCY = decouple_config('FLUTTERWAVE_MAX_CONCURRENCY', default=8, cast=int)
+PAYMENT_BATCH_MAX_SIZE = decouple_config('PAYMENT_BATCH_MAX_SIZE', default=100, cast=int)
+PAYMENT_VERIFY_BATCH_MAX_SIZE = decouple_config('PAYMENT_VERIFY_BATCH_MAX_SIZE', default=50, cast=int)
+# Clés secrètes par marchand : fichier JSON {"<slug>": {"secret_key": "...", "base_url": "..."}},
+# relu lorsqu'il est modifié (rotation sans redémarrage)
+FLUTTERWAVE_MERCHANT_SECRETS_FILE = decouple_config('FLUTTERWAVE_MERCHANT_SECRETS_FILE', default='')
+FLUTTERWAVE_SECRETS_CHECK_INTERVAL = decouple_config('FLUTTERWAVE_SECRETS_CHECK_INTERVAL', default=30, cast=int)
+# Nombre maximal de clients HTTP (un par marchand) gardés en cache
+FLUTTERWAVE_CLIENT_CACHE_SIZE = decouple_config('FLUTTERWAVE_CLIENT_CACHE_SIZE', default=64, cast=int)
+# Tâches de fond (actions de l'administration) et comptage borné des listes
+PAYMENTS_JOB_WORKERS = decouple_config('PAYMENTS_JOB_WORKERS', default=2, cast=int)
+PAYMENTS_ADMIN_COUNT_LIMIT = decouple_config('PAYMENTS_ADMIN_COUNT_LIMIT', default=10000, cast=int)
+
+
+#LIMITATION DE DÉBIT (SEAUX À JETONS, voir payments/throttling.py)
+
+# Taux par utilisateur et par action du PaymentTransactionViewSet
+PAYMENTS_THROTTLE_RATES = {
+    'initiate': '30/min',
+    'initiate_batch': '5/min',
+    'verify_transaction': '120/min',
+    'verify': '30/min',
+    'refund_transaction': '10/min',
+}
+# Budget des appels vers Flutterwave par marchand, partagé par tous les processus via Redis
+FLUTTERWAVE_GATEWAY_RATE = decouple_config('FLUTTERWAVE_GATEWAY_RATE', default='50/s')
+# Vide : état en mémoire du processus
+PAYMENTS_THROTTLE_REDIS_URL = decouple_config('PAYMENTS_THROTTLE_REDIS_URL', default='')
+
+
+#SUIVI DES STATUTS EN TEMPS RÉEL (SSE / LONG-POLLING)
+
+# 'payments.events.RedisEventBackend' pour diffuser les statuts entre plusieurs processus
+PAYMENTS_EVENTS_BACKEND = decouple_config('PAYMENTS_EVENTS_BACKEND', default='payments.events.LocalEventBackend')
+PAYMENTS_EVENTS_REDIS_URL = decouple_config('PAYMENTS_EVENTS_REDIS_URL', default='redis://localhost:6379/0')
+PAYMENTS_STREAM_HEARTBEAT = decouple_config('PAYMENTS_STREAM_HEARTBEAT', default=15, cast=int)
+PAYMENTS_STREAM_MAX_DURATION = decouple_config('PAYMENTS_STREAM_MAX_DURATION', default=600, cast=int)
+PAYMENTS_LONGPOLL_TIMEOUT = decouple_config('PAYMENTS_LONGPOLL_TIMEOUT', default=25, cast=int)
+
+
+#DOCUMENTATION OPENAPI
+
+# Le schéma est généré par `python manage.py generate_openapi_schema` et servi depuis le disque.
+# En production, désactiver OPENAPI_UI_ENABLED garde drf_yasg hors du démarrage.
+OPENAPI_UI_ENABLED = decouple_config('OPENAPI_UI_ENABLED', default=True, cast=bool)
+OPENAPI_UI_CACHE_TIMEOUT = decouple_config('OPENAPI_UI_CACHE_TIMEOUT', default=3600, cast=int)
+OPENAPI_SCHEMA_DIR = decouple_config('OPENAPI_SCHEMA_DIR', default=str(BASE_DIR / 'openapi'))
+OPENAPI_SCHEMA_URL = decouple_config('OPENAPI_SCHEMA_URL', default=None)
+OPENAPI_SCHEMA_MAX_AGE = decouple_config('OPENAPI_SCHEMA_MAX_AGE', default=300, cast=int)
+OPENAPI_SCHEMA_GENERATE_ON_MISS = decouple_config('OPENAPI_SCHEMA_GENERATE_ON_MISS', default=DEBUG, cast=bool)
+
+if OPENAPI_UI_ENABLED:
+    INSTALLED_APPS.append('drf_yasg')
+
+# Les interfaces chargent le schéma précalculé au lieu de le régénérer
+SWAGGER_SETTINGS = {
+    'SPEC_URL': ('schema-json', {'format': '.json'}),
+}
+REDOC_SETTINGS = {
+    'SPEC_URL': ('schema-json', {'format': '.json'}),
+}
\ No newline at end of file
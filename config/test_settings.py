@@ -0,0 +1,15 @@
+"""
+Réglages des tests : deux bases de shard en plus de 'default' (SQLite en
+mémoire pendant les tests), utilisées par payments/tests/test_sharding.py.
+
+    python manage.py test --settings=config.test_settings
+"""
+from config.settings import *  # noqa: F401,F403
+from config.settings import BASE_DIR, DATABASES
+
+PAYMENTS_SHARDS = ['shard01', 'shard02']
+for shard in PAYMENTS_SHARDS:
+    DATABASES.setdefault(shard, {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'{shard}.sqlite3',
+    })
@@ -1,31 +1,23 @@
-
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path,include
 
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
+from config.openapi import schema_file_view
 
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Flutterwave API",
-      default_version='v1',
-      description="Test description",
-      terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="contact@snippets.local"),
-      license=openapi.License(name="BSD License"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
-)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('payments.urls')),
-    path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    path('swagger<format>/', schema_file_view, name='schema-json'),
 ]
 
+# L'interface Swagger/ReDoc (et donc drf_yasg) n'est chargée que si elle est activée
+if settings.OPENAPI_UI_ENABLED:
+    from config.openapi import get_schema_view
+
+    schema_view = get_schema_view()
 
+    urlpatterns += [
+        path('', schema_view.with_ui('swagger', cache_timeout=settings.OPENAPI_UI_CACHE_TIMEOUT), name='schema-swagger-ui'),
+        path('redoc/', schema_view.with_ui('redoc', cache_timeout=settings.OPENAPI_UI_CACHE_TIMEOUT), name='schema-redoc'),
+    ]
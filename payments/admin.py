@@ -1,3 +1,325 @@
-from django.contrib import admin
+import datetime
 
-# Register your models here.
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS, connections, models
+from django.http import HttpResponseRedirect, QueryDict
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.http import urlencode
+
+from payments import jobs
+from payments.models import Merchant, PaymentTransaction, UserShard
+from payments.sharding import (
+    SHARDED_REFERENCE_RE, get_databases, query_each_database, shard_for_reference, sharding_enabled
+)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginateur pour les grandes tables : pas de COUNT(*) complet.
+
+    Sans filtre, le nombre de lignes vient des statistiques du SGBD
+    (PostgreSQL / MySQL). Sinon, le comptage s'arrête à
+    PAYMENTS_ADMIN_COUNT_LIMIT lignes.
+    """
+
+    @cached_property
+    def count(self):
+        limit = settings.PAYMENTS_ADMIN_COUNT_LIMIT
+        queryset = self.object_list
+
+        if not queryset.query.where:
+            estimate = self._estimate_table_rows(queryset)
+            if estimate is not None and estimate > limit:
+                return estimate
+
+        return queryset.order_by()[:limit].count()
+
+    @staticmethod
+    def _estimate_table_rows(queryset):
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+
+        if connection.vendor == 'postgresql':
+            sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass"
+        elif connection.vendor == 'mysql':
+            sql = (
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s"
+            )
+        else:
+            return None
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] and row[0] > 0 else None
+
+
+class DateHierarchyQuerySet(models.QuerySet):
+    """
+    QuerySet de l'administration : la hiérarchie de dates est calculée à
+    partir des bornes MIN/MAX (servies par l'index) au lieu d'un
+    SELECT DISTINCT sur toute la table. Des périodes vides peuvent apparaître.
+    """
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        bounds = self.aggregate(first=models.Min(field_name), last=models.Max(field_name))
+        if bounds['first'] is None:
+            return []
+
+        first = timezone.localtime(bounds['first']).replace(tzinfo=None)
+        last = timezone.localtime(bounds['last']).replace(tzinfo=None)
+
+        if kind == 'year':
+            values = [datetime.datetime(year, 1, 1) for year in range(first.year, last.year + 1)]
+        elif kind == 'month':
+            values = []
+            year, month = first.year, first.month
+            while (year, month) <= (last.year, last.month):
+                values.append(datetime.datetime(year, month, 1))
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        else:
+            start = datetime.datetime(first.year, first.month, first.day)
+            values = [
+                start + datetime.timedelta(days=offset)
+                for offset in range((last.date() - start.date()).days + 1)
+            ]
+
+        values = [timezone.make_aware(value) for value in values]
+        return values if order == 'ASC' else values[::-1]
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    """
+    Base (shard) affichée. La sélection est appliquée par
+    PaymentTransactionAdmin.get_queryset, qui la lit aussi dans les filtres
+    conservés de la page de modification.
+    """
+    title = "base"
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in get_databases()]
+
+    def choices(self, changelist):
+        # Pas de choix « Tous » : une liste ne porte que sur une base
+        for lookup, title in self.lookup_choices:
+            yield {
+                'selected': (self.value() or DEFAULT_DB_ALIAS) == lookup,
+                'query_string': changelist.get_query_string({self.parameter_name: lookup}),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        return queryset
+
+
+class ShardChangeList(ChangeList):
+    """
+    Les identifiants ne sont uniques que dans une base : le lien de
+    modification de chaque ligne porte sa base (?shard=...).
+    """
+
+    def url_for_result(self, result):
+        url = super().url_for_result(result)
+        return f"{url}?{urlencode({ShardListFilter.parameter_name: result._state.db})}"
+
+
+@admin.register(Merchant)
+class MerchantAdmin(admin.ModelAdmin):
+    list_display = ['name', 'slug', 'is_active', 'created_at']
+    list_filter = ['is_active']
+    search_fields = ['name', 'slug']
+    prepopulated_fields = {'slug': ['name']}
+
+
+@admin.register(PaymentTransaction)
+class PaymentTransactionAdmin(admin.ModelAdmin):
+    list_display = [
+        'transaction_reference',
+        'user',
+        'merchant',
+        'amount',
+        'currency',
+        'status',
+        'payment_method',
+        'created_at'
+    ]
+    # Filtres sur des choix fixes : pas de SELECT DISTINCT sur la table
+    list_filter = [ShardListFilter, 'status', 'payment_method', 'merchant']
+    # Utilisateurs et marchands sont dans 'default' : pas de jointure possible
+    list_select_related = False
+    list_per_page = 50
+    # Recherche exacte uniquement, sur des champs indexés
+    search_fields = [
+        '=transaction_reference',
+        '=flutterwave_transaction_id',
+        '=customer_email'
+    ]
+    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    raw_id_fields = ['user', 'merchant']
+    readonly_fields = [
+        'transaction_reference',
+        'flutterwave_transaction_id',
+        'raw_response',
+        'created_at',
+        'updated_at'
+    ]
+    actions = ['reverify_transactions', 'refund_transactions']
+
+    @staticmethod
+    def _requested_shard(request):
+        """Base indiquée par ?shard= ou par les filtres conservés de la liste."""
+        shard = request.GET.get(ShardListFilter.parameter_name)
+        if shard is None:
+            preserved_filters = QueryDict(request.GET.get('_changelist_filters', ''))
+            shard = preserved_filters.get(ShardListFilter.parameter_name)
+        return shard if shard in get_databases() else None
+
+    def _get_shard(self, request):
+        return self._requested_shard(request) or DEFAULT_DB_ALIAS
+
+    def _is_changelist(self, request):
+        changelist_url_name = f'{self.opts.app_label}_{self.opts.model_name}_changelist'
+        return request.resolver_match is not None and request.resolver_match.url_name == changelist_url_name
+
+    def _shard_required_response(self, request):
+        """
+        Page d'une transaction sans base (lien ancien, journal de
+        l'administration) : l'identifiant seul ne désigne pas une ligne unique.
+        """
+        self.message_user(
+            request,
+            "Base de la transaction non indiquée : ouvrez-la depuis la liste des transactions.",
+            messages.WARNING
+        )
+        return HttpResponseRedirect(reverse(
+            f'admin:{self.opts.app_label}_{self.opts.model_name}_changelist',
+            current_app=self.admin_site.name
+        ))
+
+    def get_queryset(self, request):
+        queryset = DateHierarchyQuerySet(self.model, using=self._get_shard(request))
+        queryset = queryset.prefetch_related('user', 'merchant')
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+
+        if self._is_changelist(request):
+            queryset = queryset.defer('raw_response')
+        return queryset
+
+    def get_changelist(self, request, **kwargs):
+        return ShardChangeList
+
+    def get_preserved_filters(self, request):
+        shard = request.GET.get(ShardListFilter.parameter_name)
+        if shard is None or self._is_changelist(request) or not self.preserve_filters:
+            return super().get_preserved_filters(request)
+        # Page d'une transaction : la base suit dans les liens (historique,
+        # suppression, retour à la liste)
+        preserved_filters = QueryDict(request.GET.get('_changelist_filters', ''), mutable=True)
+        preserved_filters[ShardListFilter.parameter_name] = shard
+        return urlencode({'_changelist_filters': preserved_filters.urlencode()})
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        if sharding_enabled() and self._requested_shard(request) is None:
+            return self._shard_required_response(request)
+        return super().change_view(request, object_id, form_url, extra_context)
+
+    def history_view(self, request, object_id, extra_context=None):
+        if sharding_enabled() and self._requested_shard(request) is None:
+            return self._shard_required_response(request)
+        return super().history_view(request, object_id, extra_context)
+
+    def delete_view(self, request, object_id, extra_context=None):
+        if sharding_enabled() and self._requested_shard(request) is None:
+            return self._shard_required_response(request)
+        return super().delete_view(request, object_id, extra_context)
+
+    def response_add(self, request, obj, post_url_continue=None):
+        if post_url_continue is None:
+            post_url_continue = reverse(
+                f'admin:{self.opts.app_label}_{self.opts.model_name}_change',
+                args=[obj.pk],
+                current_app=self.admin_site.name
+            ) + f"?{urlencode({ShardListFilter.parameter_name: obj._state.db})}"
+        return super().response_add(request, obj, post_url_continue)
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        # Égalité stricte : le préfixe '=' de l'admin produit un __iexact
+        # (UPPER(col) = UPPER(%s) sous PostgreSQL) qui n'utilise pas les index
+        query = models.Q()
+        for field_name in self.search_fields:
+            query |= models.Q(**{field_name.lstrip('='): search_term})
+        queryset = queryset.filter(query)
+        if ShardListFilter.parameter_name in request.GET:
+            return queryset, False
+
+        # Aucune base choisie : recherche dans toutes les bases, la liste
+        # affiche la première qui contient des résultats
+        databases = get_databases()
+        if SHARDED_REFERENCE_RE.match(search_term):
+            # Une référence encode sa base : interrogée en premier
+            home = shard_for_reference(search_term)
+            databases = [home, *(alias for alias in databases if alias != home)]
+        matches = query_each_database(lambda alias: queryset.using(alias).exists(), databases)
+        found = [alias for alias in databases if matches[alias]]
+        if not found:
+            return queryset, False
+        if len(found) > 1:
+            self.message_user(
+                request,
+                f"Résultats dans plusieurs bases ({', '.join(found)}) : {found[0]} affichée, "
+                f"utilisez le filtre « base » pour les autres.",
+                messages.WARNING
+            )
+        return queryset.using(found[0]), False
+
+    @admin.action(description="Revérifier auprès de Flutterwave (en arrière-plan)")
+    def reverify_transactions(self, request, queryset):
+        transaction_ids = list(queryset.values_list('pk', flat=True))
+        jobs.submit(jobs.reverify_transactions, queryset.db, transaction_ids)
+        self.message_user(
+            request,
+            f"Revérification lancée pour {len(transaction_ids)} transaction(s).",
+            messages.SUCCESS
+        )
+
+    @admin.action(description="Rembourser les transactions réussies (en arrière-plan)")
+    def refund_transactions(self, request, queryset):
+        transaction_ids = list(
+            queryset.filter(
+                status=PaymentTransaction.TransactionStatus.SUCCESSFUL
+            ).values_list('pk', flat=True)
+        )
+        jobs.submit(jobs.refund_transactions, queryset.db, transaction_ids, "Remboursement administrateur")
+        self.message_user(
+            request,
+            f"Remboursement lancé pour {len(transaction_ids)} transaction(s).",
+            messages.SUCCESS
+        )
+
+
+@admin.register(UserShard)
+class UserShardAdmin(admin.ModelAdmin):
+    list_display = ['user', 'shard', 'updated_at']
+    list_filter = ['shard']
+    raw_id_fields = ['user']
+    # Changement de base : commande reshard_payments (copie des transactions)
+    readonly_fields = ['shard', 'updated_at']
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,186 @@
+"""
+Diffusion des changements de statut des transactions.
+
+Le service de paiement publie chaque nouveau statut après le commit ; les
+flux SSE et le long-polling (payments.streams) s'abonnent à une référence et
+sont réveillés sans interroger la base. Le backend (settings.PAYMENTS_EVENTS_BACKEND)
+transporte les événements entre processus ; le backend local suffit lorsque
+tout tourne dans un seul processus.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('payments')
+
+
+class Subscription:
+    """Abonnement d'un client (une coroutine) aux statuts d'une transaction."""
+    __slots__ = ('reference', 'status', '_broker', '_loop', '_event')
+
+    def __init__(self, broker, reference):
+        self.reference = reference
+        self.status = None
+        self._broker = broker
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+
+    def _notify(self, status):
+        self.status = status
+        self._event.set()
+
+    def notify(self, status):
+        """Réveille l'abonné depuis n'importe quel thread."""
+        try:
+            self._loop.call_soon_threadsafe(self._notify, status)
+        except RuntimeError:
+            # Boucle fermée : l'abonné a disparu
+            self._broker.unsubscribe(self)
+
+    async def wait(self, timeout):
+        """
+        Attend le prochain statut publié.
+
+        Returns:
+            str | None: Nouveau statut, ou None si le délai est écoulé
+        """
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._event.clear()
+        return self.status
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TransactionStatusBroker:
+    """Pub/sub en mémoire : référence de transaction -> abonnés du processus."""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, reference):
+        get_backend().start()
+        subscription = Subscription(self, reference)
+        with self._lock:
+            self._subscribers.setdefault(reference, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.reference)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.reference]
+
+    def dispatch(self, reference, status):
+        with self._lock:
+            subscribers = tuple(self._subscribers.get(reference, ()))
+        for subscription in subscribers:
+            subscription.notify(status)
+
+
+broker = TransactionStatusBroker()
+
+
+class LocalEventBackend:
+    """Backend mono-processus : les événements sont distribués directement."""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def start(self):
+        pass
+
+    def publish(self, reference, status):
+        self.broker.dispatch(reference, status)
+
+
+class RedisEventBackend(LocalEventBackend):
+    """
+    Backend multi-processus basé sur le pub/sub Redis.
+
+    Chaque processus écoute le canal dans un thread dédié, démarré au premier
+    abonnement, et redistribue les événements à ses abonnés locaux.
+    """
+    channel = 'payments:transaction-status'
+
+    def __init__(self, broker):
+        super().__init__(broker)
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured(
+                "RedisEventBackend nécessite le paquet 'redis'"
+            ) from exc
+        self._client = redis.Redis.from_url(settings.PAYMENTS_EVENTS_REDIS_URL)
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name='payments-events', daemon=True
+                )
+                self._listener.start()
+
+    def publish(self, reference, status):
+        self._client.publish(
+            self.channel,
+            json.dumps({'transaction_reference': reference, 'status': status})
+        )
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    event = json.loads(message['data'])
+                    self.broker.dispatch(event['transaction_reference'], event['status'])
+            except Exception:
+                logger.exception("Écoute Redis interrompue, reconnexion")
+                time.sleep(1)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.PAYMENTS_EVENTS_BACKEND)(broker)
+
+
+def publish_status(transaction_reference, status, using=None):
+    """
+    Publie le statut d'une transaction une fois la transaction DB validée.
+
+    Args:
+        using (str, optional): Base de la transaction (sharding)
+    """
+    def publish():
+        try:
+            get_backend().publish(transaction_reference, status)
+        except Exception:
+            logger.exception("Échec de la publication du statut %s", transaction_reference)
+
+    transaction.on_commit(publish, using=using)
@@ -13,10 +13,21 @@ class PaymentInitiationError(PaymentException):
 
 class PaymentVerificationError(PaymentException):
     """Erreur lors de la vérification du paiement"""
-    def __init__(self, message, error_code='PAYMENT_VERIFICATION_FAILED'):
-        super().__init__(message, error_code=error_code, status_code=404)
+    def __init__(self, message, error_code='PAYMENT_VERIFICATION_FAILED', status_code=404):
+        super().__init__(message, error_code=error_code, status_code=status_code)
         
 class RefundException(PaymentException):
     """Exception spécifique pour les erreurs de remboursement"""
     def __init__(self, message, error_code='REFUND_FAILED'):
         super().__init__(message, error_code=error_code, status_code=400)
+
+class GatewayRateLimitError(PaymentException):
+    """Budget d'appels sortants vers Flutterwave épuisé"""
+    def __init__(self, message, retry_after, error_code='GATEWAY_RATE_LIMITED'):
+        super().__init__(message, error_code=error_code, status_code=429)
+        self.retry_after = retry_after
+
+class MerchantConfigurationError(PaymentException):
+    """Marchand inconnu, inactif ou sans clé secrète"""
+    def __init__(self, message, error_code='MERCHANT_NOT_CONFIGURED'):
+        super().__init__(message, error_code=error_code, status_code=503)
@@ -0,0 +1,187 @@
+"""
+Clients HTTP Flutterwave par marchand.
+
+Chaque marchand a son propre client (session requests avec son pool de
+connexions). Les clients sont gardés dans un cache LRU borné et partagé entre
+threads. Les clés secrètes viennent du fichier
+FLUTTERWAVE_MERCHANT_SECRETS_FILE, relu lorsqu'il change : une rotation de
+clé ne demande pas de redémarrage. Sans marchand, la clé des settings est
+utilisée.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from payments.exceptions import MerchantConfigurationError
+
+logger = logging.getLogger('payments')
+
+# Compte Flutterwave par défaut (sans marchand) : budget d'appels et cache des
+# clients séparés de ceux d'un éventuel marchand nommé « default »
+DEFAULT_MERCHANT = 'default'
+_DEFAULT_ACCOUNT = object()
+
+
+class FlutterwaveClient:
+    """Client HTTP d'un compte Flutterwave."""
+
+    def __init__(self, base_url, secret_key, timeout, pool_size):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.fingerprint = hashlib.sha256(secret_key.encode()).hexdigest()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {secret_key}",
+            "Content-Type": "application/json"
+        })
+
+        # Gérés par MerchantRegistry, sous son verrou
+        self.in_use = 0
+        self.retired = False
+
+    def get(self, path):
+        return self.session.get(f"{self.base_url}{path}", timeout=self.timeout)
+
+    def post(self, path, payload):
+        return self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+
+    def close(self):
+        self.session.close()
+
+
+class MerchantRegistry:
+    """
+    Cache LRU borné des clients Flutterwave, indexé par marchand.
+
+    Un client évincé ou remplacé (rotation de clé) est fermé dès qu'aucune
+    requête ne l'utilise plus.
+
+    Args:
+        max_clients (int): Nombre maximal de clients conservés
+    """
+
+    def __init__(self, max_clients):
+        self.max_clients = max_clients
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self._secrets = None
+        self._secrets_mtime = None
+        self._secrets_checked_at = None
+        self._secrets_lock = threading.Lock()
+
+    @contextmanager
+    def client(self, merchant=None):
+        """
+        Fournit le client du marchand (ou du compte par défaut) pour la durée
+        du bloc ``with``.
+
+        Raises:
+            MerchantConfigurationError: Marchand inactif ou sans clé secrète
+        """
+        client = self._acquire(merchant)
+        try:
+            yield client
+        finally:
+            with self._lock:
+                client.in_use -= 1
+                close = client.retired and client.in_use == 0
+            if close:
+                client.close()
+
+    def _acquire(self, merchant):
+        if merchant is not None and not merchant.is_active:
+            raise MerchantConfigurationError(f"Marchand inactif: {merchant.slug}")
+
+        key = merchant.slug if merchant is not None else _DEFAULT_ACCOUNT
+        credentials = self._get_credentials(merchant)
+        fingerprint = hashlib.sha256(credentials['secret_key'].encode()).hexdigest()
+
+        retired = []
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None or client.fingerprint != fingerprint:
+                if client is not None:
+                    # Clé changée : l'ancien client est fermé après ses requêtes en cours
+                    retired.append(client)
+                client = FlutterwaveClient(
+                    base_url=credentials.get('base_url') or settings.FLUTTERWAVE_BASE_URL,
+                    secret_key=credentials['secret_key'],
+                    timeout=settings.FLUTTERWAVE_TIMEOUT,
+                    pool_size=settings.FLUTTERWAVE_MAX_CONCURRENCY
+                )
+                self._clients[key] = client
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.max_clients:
+                retired.append(self._clients.popitem(last=False)[1])
+
+            client.in_use += 1
+            to_close = []
+            for old_client in retired:
+                old_client.retired = True
+                if old_client.in_use == 0:
+                    to_close.append(old_client)
+
+        for old_client in to_close:
+            old_client.close()
+        return client
+
+    def _get_credentials(self, merchant):
+        if merchant is None:
+            return {'secret_key': settings.FLUTTERWAVE_SECRET_KEY}
+        secrets = self._load_secrets()
+        if merchant.slug in secrets:
+            return secrets[merchant.slug]
+        raise MerchantConfigurationError(f"Aucune clé secrète pour le marchand {merchant.slug}")
+
+    def _load_secrets(self):
+        """
+        Lit le fichier des clés secrètes une seule fois, puis seulement s'il a
+        changé (vérification au plus toutes les FLUTTERWAVE_SECRETS_CHECK_INTERVAL secondes).
+        Si une relecture échoue (fichier en cours d'écriture), les clés
+        précédentes restent utilisées.
+        """
+        path = settings.FLUTTERWAVE_MERCHANT_SECRETS_FILE
+        if not path:
+            return {}
+
+        interval = settings.FLUTTERWAVE_SECRETS_CHECK_INTERVAL
+        now = time.monotonic()
+        if self._secrets is not None and now - self._secrets_checked_at < interval:
+            return self._secrets
+
+        with self._secrets_lock:
+            if self._secrets is not None and now - self._secrets_checked_at < interval:
+                return self._secrets
+            try:
+                mtime = os.stat(path).st_mtime
+                if mtime != self._secrets_mtime:
+                    with open(path, encoding='utf-8') as secrets_file:
+                        secrets = json.load(secrets_file)
+                    if not isinstance(secrets, dict):
+                        raise ValueError("objet JSON attendu")
+                    self._secrets, self._secrets_mtime = secrets, mtime
+            except (OSError, ValueError) as e:
+                if self._secrets is None:
+                    raise MerchantConfigurationError(f"Fichier des clés illisible: {path} ({e})")
+                logger.error(
+                    "Relecture du fichier des clés impossible, clés précédentes conservées",
+                    extra={'error_code': 'MERCHANT_SECRETS_UNREADABLE'}
+                )
+            self._secrets_checked_at = now
+            return self._secrets
+
+
+merchant_registry = MerchantRegistry(max_clients=settings.FLUTTERWAVE_CLIENT_CACHE_SIZE)
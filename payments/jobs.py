@@ -0,0 +1,84 @@
+"""
+Tâches de fond lancées depuis l'administration.
+
+Les tâches tournent dans un pool de threads borné du processus web : la
+requête d'administration rend la main immédiatement.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from payments.exceptions import PaymentException
+from payments.models import PaymentTransaction
+from payments.services import FlutterwavePaymentService
+
+logger = logging.getLogger('payments')
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.PAYMENTS_JOB_WORKERS,
+    thread_name_prefix='payments-job'
+)
+
+
+def _run(job, *args):
+    try:
+        job(*args)
+    except Exception:
+        logger.exception("Échec de la tâche de fond %s", job.__name__)
+    finally:
+        close_old_connections()
+
+
+def submit(job, *args):
+    """Planifie ``job(*args)`` dans le pool de tâches de fond."""
+    return _executor.submit(_run, job, *args)
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def reverify_transactions(using, transaction_ids):
+    """
+    Revérifie des transactions auprès de Flutterwave, par lots.
+
+    Args:
+        using (str): Base (shard) des transactions
+        transaction_ids (list): Clés primaires des transactions
+    """
+    payment_service = FlutterwavePaymentService()
+    for chunk in _chunks(transaction_ids, settings.PAYMENT_VERIFY_BATCH_MAX_SIZE):
+        transactions = PaymentTransaction.objects.using(using).filter(
+            pk__in=chunk
+        ).prefetch_related('merchant').defer('raw_response')
+        payment_service.verify_transactions(transactions)
+    logger.info("Revérification terminée pour %s transactions", len(transaction_ids))
+
+
+def refund_transactions(using, transaction_ids, reason=None):
+    """
+    Rembourse des transactions réussies une par une.
+
+    Args:
+        using (str): Base (shard) des transactions
+        transaction_ids (list): Clés primaires des transactions
+        reason (str, optional): Raison du remboursement
+    """
+    payment_service = FlutterwavePaymentService()
+    refunded = 0
+    for chunk in _chunks(transaction_ids, settings.PAYMENT_VERIFY_BATCH_MAX_SIZE):
+        transactions = PaymentTransaction.objects.using(using).filter(
+            pk__in=chunk,
+            status=PaymentTransaction.TransactionStatus.SUCCESSFUL
+        ).prefetch_related('merchant')
+        for transaction in transactions:
+            try:
+                payment_service.refund_transaction(transaction, reason=reason)
+                refunded += 1
+            except PaymentException:
+                # Déjà journalisé par le service
+                continue
+    logger.info("Remboursement terminé : %s/%s transactions", refunded, len(transaction_ids))
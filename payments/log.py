@@ -0,0 +1,251 @@
+"""
+Journalisation du logger ``payments``.
+
+Les enregistrements sont mis en file (bornée) par le thread de la requête puis
+formatés en JSON et écrits par un thread dédié. Les erreurs répétées sont
+échantillonnées par error_code, et les secrets / données personnelles sont
+masqués au formatage. La configuration se trouve dans settings.LOGGING.
+"""
+import copy
+import datetime
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener
+
+from django.utils.module_loading import import_string
+
+REDACTED = '[REDACTED]'
+
+# Clés masquées quelle que soit leur valeur (comparaison insensible à la casse)
+SENSITIVE_KEYS = frozenset({
+    'authorization', 'password', 'secret', 'secret_key', 'encryption_key', 'token',
+    'cvv', 'pin', 'otp', 'card', 'card_number', 'cardno', 'expiry_month', 'expiry_year',
+    'account_number', 'bvn',
+    'email', 'customer_email', 'phone', 'phone_number', 'name', 'fullname',
+    'first_name', 'last_name', 'address', 'ip',
+})
+SENSITIVE_KEY_PARTS = ('secret', 'password', 'token', 'authorization')
+
+SENSITIVE_PATTERNS = (
+    # Clés Flutterwave (FLWSECK-..., FLWPUBK-..., FLWSECK_TEST-...)
+    re.compile(r'FLW(?:SECK|PUBK)(?:_TEST)?-[\w-]+'),
+    re.compile(r'Bearer\s+\S+', re.IGNORECASE),
+    re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+'),
+)
+
+
+def _is_sensitive_key(key):
+    key = str(key).lower()
+    return key in SENSITIVE_KEYS or any(part in key for part in SENSITIVE_KEY_PARTS)
+
+
+def redact(value):
+    """
+    Retourne une copie de ``value`` où les secrets et données personnelles
+    sont masqués (dictionnaires, listes et chaînes, récursivement).
+    """
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if _is_sensitive_key(key) else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        for pattern in SENSITIVE_PATTERNS:
+            value = pattern.sub(REDACTED, value)
+        return value
+    return value
+
+
+class RedactingJsonFormatter(logging.Formatter):
+    """
+    Formate un enregistrement en une ligne JSON.
+
+    Le message n'est construit qu'ici (dans le thread d'écriture), à partir
+    d'arguments masqués.
+    """
+    EXTRA_FIELDS = ('error_code', 'transaction_reference', 'payload', 'suppressed', 'dropped')
+
+    def format(self, record):
+        args = record.args
+        if isinstance(args, dict):
+            args = redact(args)
+        elif args:
+            args = tuple(redact(arg) if isinstance(arg, (dict, list, tuple, str)) else arg for arg in args)
+
+        message = str(record.msg)
+        if args:
+            message = message % args
+
+        data = {
+            'timestamp': datetime.datetime.fromtimestamp(
+                record.created, tz=datetime.timezone.utc
+            ).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': redact(message),
+        }
+        for field in self.EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = redact(value)
+        if record.exc_text:
+            data['exception'] = redact(record.exc_text)
+        if record.stack_info:
+            data['stack'] = record.stack_info
+
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class ErrorSamplingFilter(logging.Filter):
+    """
+    Limite les erreurs répétées : au plus ``burst`` enregistrements par clé
+    (error_code, sinon le gabarit du message) et par fenêtre de ``interval``
+    secondes. Le premier enregistrement de la fenêtre suivante porte le nombre
+    d'enregistrements supprimés. Le nombre de clés suivies est borné.
+    """
+
+    def __init__(self, burst=10, interval=60, level=logging.ERROR, max_keys=1000):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.level = level if isinstance(level, int) else logging.getLevelName(level)
+        self.max_keys = max_keys
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < self.level:
+            return True
+
+        key = (record.name, getattr(record, 'error_code', None) or record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                self._windows[key] = [now, 1, 0]
+                self._windows.move_to_end(key)
+                if len(self._windows) > self.max_keys:
+                    self._windows.popitem(last=False)
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+
+            window[2] += 1
+            return False
+
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    Handler non bloquant : met l'enregistrement dans une file bornée et laisse
+    un QueueListener le formater et l'écrire avec le handler ``target``.
+
+    Si la file est pleine, l'enregistrement est abandonné ; le nombre
+    d'abandons est reporté sur l'enregistrement suivant.
+
+    Le thread d'écriture démarre au premier enregistrement, et redémarre dans
+    un processus issu d'un fork (gunicorn --preload) où il n'existe plus. Il
+    est arrêté (file vidée) par close(), appelé par logging.shutdown() à la
+    sortie du processus.
+
+    Se configure avec la clé ``'()'`` de dictConfig : avec ``'class'``,
+    Python 3.12+ exige une clé ``handlers`` pour toute sous-classe de
+    QueueHandler.
+
+    Args:
+        target (str): Classe du handler d'écriture (chemin pointé)
+        target_kwargs (dict): Arguments du handler d'écriture
+        queue_size (int): Taille maximale de la file
+    """
+
+    def __init__(self, target='logging.StreamHandler', target_kwargs=None, queue_size=10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.target = import_string(target)(**(target_kwargs or {}))
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._exc_formatter = logging.Formatter()
+        self.listener = None
+        self._listener_pid = None
+        self._start_lock = threading.Lock()
+        _async_handlers.add(self)
+
+    def _after_fork(self):
+        # Les verrous ont pu être copiés verrouillés, la file contient des
+        # enregistrements du parent qu'il écrira lui-même
+        self._start_lock = threading.Lock()
+        self._dropped_lock = threading.Lock()
+        self._dropped = 0
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self.listener = None
+        self._listener_pid = None
+
+    def _start_listener(self):
+        with self._start_lock:
+            if self._listener_pid == os.getpid():
+                return
+            self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+            self.listener.start()
+            self._listener_pid = os.getpid()
+
+    def setFormatter(self, fmt):
+        # Le formatage a lieu dans le thread d'écriture
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        if record.exc_info:
+            # La trace est rendue tout de suite pour ne pas retenir les frames
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        with self._dropped_lock:
+            if self._dropped:
+                record.dropped, self._dropped = self._dropped, 0
+        return record
+
+    def enqueue(self, record):
+        if self._listener_pid != os.getpid():
+            self._start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                # Les abandons reportés sur cet enregistrement ne sont pas perdus
+                self._dropped += 1 + (getattr(record, 'dropped', None) or 0)
+
+    def _stop_listener(self):
+        # Vide la file avant l'arrêt ; sans effet si déjà arrêté ou jamais démarré
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+
+    def close(self):
+        self._stop_listener()
+        self.target.close()
+        _async_handlers.discard(self)
+        super().close()
+
+
+# Handlers vivants : un seul hook de fork pour tous, même si la configuration
+# de la journalisation est rechargée
+_async_handlers = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    for handler in list(_async_handlers):
+        handler._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
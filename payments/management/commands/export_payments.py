@@ -0,0 +1,59 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from payments.models import PaymentTransaction
+from payments.sharding import iter_all_databases
+
+EXPORT_COLUMNS = [
+    'transaction_reference',
+    'flutterwave_transaction_id',
+    'user_id',
+    'merchant_id',
+    'amount',
+    'currency',
+    'status',
+    'payment_method',
+    'customer_email',
+    'created_at',
+    'updated_at',
+]
+
+
+class Command(BaseCommand):
+    help = "Exporte en CSV les transactions de toutes les bases, de la plus récente à la plus ancienne"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Fichier CSV (par défaut: sortie standard)")
+        parser.add_argument('--status', choices=PaymentTransaction.TransactionStatus.values)
+        parser.add_argument('--user', type=int, help="Identifiant de l'utilisateur")
+        parser.add_argument('--since', type=parse_date, help="Date de création minimale (AAAA-MM-JJ)")
+        parser.add_argument('--until', type=parse_date, help="Date de création maximale (AAAA-MM-JJ)")
+
+    def handle(self, *args, **options):
+        queryset = PaymentTransaction.objects.all()
+        if options['status']:
+            queryset = queryset.filter(status=options['status'])
+        if options['user'] is not None:
+            queryset = queryset.filter(user_id=options['user'])
+        if options['since']:
+            queryset = queryset.filter(created_at__date__gte=options['since'])
+        if options['until']:
+            queryset = queryset.filter(created_at__date__lte=options['until'])
+
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        exported = 0
+        try:
+            writer = csv.writer(output)
+            writer.writerow(EXPORT_COLUMNS)
+            # Fusion en flux des résultats de chaque base, triés par date de création
+            for row in iter_all_databases(queryset.values(*EXPORT_COLUMNS), order_by='-created_at'):
+                writer.writerow([row[column] for column in EXPORT_COLUMNS])
+                exported += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        self.stderr.write(f"Transactions exportées: {exported}")
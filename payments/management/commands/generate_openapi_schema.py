@@ -0,0 +1,32 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from config.openapi import SCHEMA_FORMATS, generate_schema, schema_path
+
+
+class Command(BaseCommand):
+    help = "Génère le schéma OpenAPI une seule fois (à lancer au déploiement)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=[fmt.lstrip('.') for fmt in SCHEMA_FORMATS],
+            action='append',
+            help="Format(s) à générer (par défaut: tous)",
+        )
+
+    def handle(self, *args, **options):
+        formats = [f'.{fmt}' for fmt in options['format']] if options['format'] else list(SCHEMA_FORMATS)
+
+        for schema_format in formats:
+            path = schema_path(schema_format)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            # Écriture atomique pour ne jamais servir un fichier partiel
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as schema_file:
+                schema_file.write(generate_schema(schema_format))
+            os.replace(tmp_path, path)
+
+            self.stdout.write(self.style.SUCCESS(f"Schéma écrit: {path}"))
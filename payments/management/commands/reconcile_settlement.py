@@ -0,0 +1,87 @@
+import csv
+import sys
+from dataclasses import astuple, fields
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.reconciliation import (
+    Mismatch,
+    Reconciler,
+    ReportFields,
+    iter_csv_records,
+    iter_json_records,
+)
+
+
+class Command(BaseCommand):
+    help = "Rapproche un rapport Flutterwave (CSV ou JSON) avec les transactions en base"
+
+    def add_arguments(self, parser):
+        parser.add_argument('report', help="Chemin du rapport Flutterwave")
+        parser.add_argument(
+            '--format',
+            choices=['auto', 'csv', 'json'],
+            default='auto',
+            help="Format du rapport (auto: d'après l'extension)"
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help="Passe à leur état final les transactions en cours dont le rapport donne un statut final"
+        )
+        parser.add_argument(
+            '--output',
+            help="Fichier CSV des écarts (par défaut: sortie standard)"
+        )
+        defaults = ReportFields()
+        for report_field in fields(ReportFields):
+            parser.add_argument(
+                f"--{report_field.name.replace('_', '-')}-column",
+                dest=f"{report_field.name}_column",
+                default=getattr(defaults, report_field.name),
+            )
+
+    def handle(self, *args, **options):
+        report_format = options['format']
+        if report_format == 'auto':
+            report_format = 'json' if options['report'].lower().endswith(('.json', '.jsonl')) else 'csv'
+        read_records = iter_json_records if report_format == 'json' else iter_csv_records
+
+        report_fields = ReportFields(**{
+            report_field.name: options[f"{report_field.name}_column"]
+            for report_field in fields(ReportFields)
+        })
+        reconciler = Reconciler(
+            chunk_size=options['chunk_size'],
+            repair=options['repair'],
+            fields=report_fields
+        )
+
+        try:
+            report = open(options['report'], newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(str(e))
+
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            writer = csv.writer(output)
+            writer.writerow([mismatch_field.name for mismatch_field in fields(Mismatch)])
+            with report:
+                for mismatch in reconciler.run(read_records(report)):
+                    writer.writerow(astuple(mismatch))
+        except ValueError as e:
+            # Rapport mal formé (JSON invalide, élément trop grand)
+            raise CommandError(f"Rapport invalide: {e}")
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        summary = reconciler.summary
+        self.stderr.write(
+            f"Lignes: {summary.records} | rapprochées: {summary.matched} | "
+            f"absentes: {summary.missing} | en écart: {summary.mismatched} | "
+            f"corrigées: {summary.repaired}"
+        )
+        for field_name, count in sorted(summary.mismatches_by_field.items()):
+            self.stderr.write(f"  {field_name}: {count}")
@@ -0,0 +1,182 @@
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from payments.models import PaymentTransaction, UserShard
+from payments.sharding import choose_shard, get_databases, get_user_shard, sharding_enabled
+
+# Tours copie/suppression au plus pour vider la base source
+MAX_CLEANUP_ATTEMPTS = 3
+
+
+class Command(BaseCommand):
+    help = (
+        "Déplace les transactions d'utilisateurs vers une autre base, sans "
+        "interruption : copie, bascule de l'affectation, resynchronisation des "
+        "lignes modifiées pendant la copie, puis suppression dans la base source"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='users',
+            help="Identifiant d'un utilisateur à déplacer (option répétable)"
+        )
+        parser.add_argument(
+            '--from',
+            dest='source',
+            help="Déplace tous les utilisateurs de cette base"
+        )
+        parser.add_argument(
+            '--to',
+            dest='target',
+            help="Base cible (par défaut: base choisie par hachage de l'utilisateur)"
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--grace',
+            type=float,
+            default=2.0,
+            help="Secondes d'attente après la bascule, pour les requêtes encore en cours"
+        )
+
+    def handle(self, *args, **options):
+        if not sharding_enabled():
+            raise CommandError("PAYMENTS_SHARDS n'est pas défini")
+
+        databases = get_databases()
+        for alias in (options['source'], options['target']):
+            if alias is not None and alias not in databases:
+                raise CommandError(f"Base inconnue: {alias} (bases: {', '.join(databases)})")
+
+        if options['users']:
+            user_ids = options['users']
+        elif options['source']:
+            user_ids = self._users_in(options['source'])
+        else:
+            raise CommandError("Indiquez --user ou --from")
+
+        self.chunk_size = options['chunk_size']
+        self.grace = options['grace']
+        for user_id in user_ids:
+            self._move_user(user_id, options['target'] or choose_shard(user_id))
+
+    @staticmethod
+    def _users_in(shard):
+        user_ids = set(UserShard.objects.filter(shard=shard).values_list('user_id', flat=True))
+        if shard == DEFAULT_DB_ALIAS:
+            # Utilisateurs sans affectation : transactions antérieures au sharding
+            assigned_elsewhere = UserShard.objects.exclude(shard=shard).values_list('user_id', flat=True)
+            user_ids.update(
+                PaymentTransaction.objects.using(shard).exclude(
+                    user_id__in=list(assigned_elsewhere)
+                ).exclude(user_id=None).values_list('user_id', flat=True).distinct()
+            )
+        return sorted(user_ids)
+
+    def _move_user(self, user_id, target):
+        source = get_user_shard(user_id)
+        if source == target:
+            self.stdout.write(f"Utilisateur {user_id}: déjà dans {target}")
+            return
+
+        copy_started_at = timezone.now()
+        copied = self._copy(user_id, source, target)
+
+        # Bascule : les nouvelles transactions de l'utilisateur vont dans la base cible
+        UserShard.objects.update_or_create(user_id=user_id, defaults={'shard': target})
+        time.sleep(self.grace)
+
+        # Lignes créées ou modifiées dans la base source pendant la copie
+        resync_started_at = timezone.now()
+        resynced = self._copy(user_id, source, target, updated_since=copy_started_at)
+
+        deleted = 0
+        for _ in range(MAX_CLEANUP_ATTEMPTS):
+            updated_since, resync_started_at = resync_started_at, timezone.now()
+            with transaction.atomic(using=source):
+                source_rows = PaymentTransaction.objects.using(source).filter(user_id=user_id)
+                # Verrouille les lignes : plus de modification concurrente jusqu'à la suppression
+                locked_pks = list(source_rows.select_for_update().values_list('pk', flat=True))
+                resynced += self._copy(user_id, source, target, updated_since=updated_since)
+                # Seules les lignes verrouillées (donc copiées) sont supprimées
+                deleted += source_rows.filter(pk__in=locked_pks).delete()[0]
+
+            # Lignes insérées après la dernière copie (select_for_update est sans
+            # effet sur SQLite) : copiées au tour suivant
+            if not PaymentTransaction.objects.using(source).filter(user_id=user_id).exists():
+                break
+        else:
+            raise CommandError(
+                f"Utilisateur {user_id}: des transactions sont encore créées dans {source} "
+                f"après la bascule vers {target}, relancez la commande"
+            )
+
+        self.stdout.write(
+            f"Utilisateur {user_id}: {source} -> {target} "
+            f"({copied} copiées, {resynced} resynchronisées, {deleted} supprimées de {source})"
+        )
+
+    def _copy(self, user_id, source, target, updated_since=None):
+        """
+        Copie (ou met à jour, d'après la référence) les transactions de
+        l'utilisateur dans la base cible ; les lignes copiées y reçoivent de
+        nouvelles clés primaires.
+        """
+        queryset = PaymentTransaction.objects.using(source).filter(user_id=user_id).order_by('pk')
+        if updated_since is not None:
+            queryset = queryset.filter(updated_at__gte=updated_since)
+
+        fields = [
+            field.name for field in PaymentTransaction._meta.concrete_fields
+            if not field.primary_key
+        ]
+        target_transactions = PaymentTransaction.objects.using(target)
+        rows = queryset.iterator(chunk_size=self.chunk_size)
+        copied = 0
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return copied
+
+            references = [payment_transaction.transaction_reference for payment_transaction in chunk]
+            # bulk_create réécrit created_at / updated_at (auto_now) : valeurs d'origine restaurées ensuite
+            timestamps = {
+                payment_transaction.transaction_reference: (
+                    payment_transaction.created_at, payment_transaction.updated_at
+                )
+                for payment_transaction in chunk
+            }
+
+            with transaction.atomic(using=target):
+                existing = dict(
+                    target_transactions.filter(
+                        transaction_reference__in=references
+                    ).values_list('transaction_reference', 'pk')
+                )
+                to_create = []
+                for payment_transaction in chunk:
+                    payment_transaction.pk = existing.get(payment_transaction.transaction_reference)
+                    if payment_transaction.pk is None:
+                        to_create.append(payment_transaction)
+
+                if to_create:
+                    target_transactions.bulk_create(to_create)
+                    existing = dict(
+                        target_transactions.filter(
+                            transaction_reference__in=references
+                        ).values_list('transaction_reference', 'pk')
+                    )
+
+                for payment_transaction in chunk:
+                    payment_transaction.pk = existing[payment_transaction.transaction_reference]
+                    payment_transaction.created_at, payment_transaction.updated_at = (
+                        timestamps[payment_transaction.transaction_reference]
+                    )
+                target_transactions.bulk_update(chunk, fields)
+            copied += len(chunk)
@@ -28,7 +28,7 @@ class Migration(migrations.Migration):
                 ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de Mise à Jour')),
                 ('customer_email', models.EmailField(blank=True, max_length=254, null=True, verbose_name='Email Client')),
                 ('raw_response', models.JSONField(blank=True, null=True, verbose_name='Réponse Brute')),
-                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment_transactions', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+                ('user', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment_transactions', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
             ],
             options={
                 'verbose_name': 'Transaction de Paiement',
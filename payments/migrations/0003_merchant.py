@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-19 06:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_paymenttransaction_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Merchant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Nom')),
+                ('slug', models.SlugField(unique=True, verbose_name='Identifiant')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Actif')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de Création')),
+            ],
+            options={
+                'verbose_name': 'Marchand',
+                'verbose_name_plural': 'Marchands',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='paymenttransaction',
+            name='merchant',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='payment_transactions', to='payments.merchant', verbose_name='Marchand'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-19 06:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_merchant'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymenttransaction',
+            index=models.Index(fields=['user', 'updated_at'], name='payment_user_updated_idx'),
+        ),
+    ]
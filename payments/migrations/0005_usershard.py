@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-19 06:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('payments', '0004_paymenttransaction_user_updated_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserShard',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='payment_shard', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+                ('shard', models.CharField(max_length=50, verbose_name='Base')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de Mise à Jour')),
+            ],
+            options={
+                'verbose_name': 'Affectation de Base',
+                'verbose_name_plural': 'Affectations de Base',
+            },
+        ),
+    ]
@@ -2,6 +2,42 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 
+class Merchant(models.Model):
+    """
+    Compte Flutterwave d'un marchand. La clé secrète n'est pas stockée en
+    base : elle est lue dans FLUTTERWAVE_MERCHANT_SECRETS_FILE (voir
+    payments.gateway).
+    """
+    name = models.CharField(
+        max_length=100,
+        verbose_name=_('Nom')
+    )
+
+    slug = models.SlugField(
+        max_length=50,
+        unique=True,
+        verbose_name=_('Identifiant')
+    )
+
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name=_('Actif')
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('Date de Création')
+    )
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = _('Marchand')
+        verbose_name_plural = _('Marchands')
+        ordering = ['name']
+
+
 class PaymentTransaction(models.Model):
     class TransactionStatus(models.TextChoices):
         INITIATED = 'INITIATED', _('Transaction Initiée')
@@ -16,13 +52,34 @@ class PaymentTransaction(models.Model):
         MOBILE_MONEY = 'MOBILE_MONEY', _('Mobile Money')
         USSD = 'USSD', _('USSD')
 
+    # Statuts qui ne changent plus après vérification auprès de Flutterwave
+    TERMINAL_STATUSES = (
+        TransactionStatus.SUCCESSFUL,
+        TransactionStatus.FAILED,
+        TransactionStatus.REFUNDED,
+    )
+
+    # Les transactions peuvent vivre dans une autre base que les utilisateurs
+    # et les marchands (sharding) : pas de contrainte de clé étrangère en base
     user = models.ForeignKey(
         User, 
         on_delete=models.SET_NULL, 
         related_name='payment_transactions',
         null=True,
+        db_constraint=False,
         verbose_name=_('Utilisateur')
     )
+
+    # Vide : compte Flutterwave par défaut (FLUTTERWAVE_SECRET_KEY)
+    merchant = models.ForeignKey(
+        Merchant,
+        on_delete=models.PROTECT,
+        related_name='payment_transactions',
+        null=True,
+        blank=True,
+        db_constraint=False,
+        verbose_name=_('Marchand')
+    )
     
     transaction_reference = models.CharField(
         max_length=100, 
@@ -93,3 +150,41 @@ class PaymentTransaction(models.Model):
         verbose_name = _('Transaction de Paiement')
         verbose_name_plural = _('Transactions de Paiement')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['flutterwave_transaction_id'], name='payment_flw_id_idx'),
+            models.Index(fields=['customer_email'], name='payment_customer_email_idx'),
+            models.Index(fields=['created_at'], name='payment_created_at_idx'),
+            # ETag des listes par utilisateur : MAX(updated_at) et COUNT depuis l'index
+            models.Index(fields=['user', 'updated_at'], name='payment_user_updated_idx'),
+        ]
+
+
+class UserShard(models.Model):
+    """
+    Base (shard) qui contient les transactions d'un utilisateur. Stocké dans
+    'default' ; sans ligne, les transactions sont dans 'default'.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='payment_shard',
+        verbose_name=_('Utilisateur')
+    )
+
+    shard = models.CharField(
+        max_length=50,
+        verbose_name=_('Base')
+    )
+
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_('Date de Mise à Jour')
+    )
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.shard}"
+
+    class Meta:
+        verbose_name = _('Affectation de Base')
+        verbose_name_plural = _('Affectations de Base')
@@ -0,0 +1,305 @@
+"""
+Rapprochement des rapports Flutterwave (transactions / règlements) avec
+PaymentTransaction.
+
+Le fichier est lu en flux et traité par lots : chaque lot est rapproché avec
+une requête ``IN`` sur transaction_reference (puis sur
+flutterwave_transaction_id pour les lignes restantes), sur chaque base
+(sharding). La mémoire utilisée ne dépend que de la taille des lots, pas de
+celle du fichier.
+"""
+import csv
+import json
+import re
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from collections import defaultdict
+
+from django.db import reset_queries, transaction
+from django.utils import timezone
+
+from payments.events import publish_status
+from payments.models import PaymentTransaction
+from payments.sharding import query_each_database
+
+# Statuts Flutterwave -> statuts internes
+GATEWAY_STATUSES = {
+    'successful': PaymentTransaction.TransactionStatus.SUCCESSFUL,
+    'success': PaymentTransaction.TransactionStatus.SUCCESSFUL,
+    'completed': PaymentTransaction.TransactionStatus.SUCCESSFUL,
+    'failed': PaymentTransaction.TransactionStatus.FAILED,
+    'cancelled': PaymentTransaction.TransactionStatus.FAILED,
+    'error': PaymentTransaction.TransactionStatus.FAILED,
+    'pending': PaymentTransaction.TransactionStatus.PENDING,
+    'refunded': PaymentTransaction.TransactionStatus.REFUNDED,
+    'reversed': PaymentTransaction.TransactionStatus.REFUNDED,
+}
+
+READ_BUFFER_SIZE = 1024 * 1024
+# Taille maximale d'un élément (objet ou ligne) : au-delà, le rapport est
+# considéré comme invalide plutôt que d'accumuler le fichier en mémoire
+MAX_RECORD_SIZE = 1024 * 1024
+# Fin de tampon qui peut encore devenir un jeton JSON valide
+INCOMPLETE_TOKEN = re.compile(r'[^\s,:\[\]{}"]*')
+
+
+def iter_csv_records(file):
+    """Lit un rapport CSV (avec en-tête) ligne par ligne."""
+    yield from csv.DictReader(file)
+
+
+def iter_json_records(file):
+    """
+    Lit un rapport JSON en flux : un tableau d'objets, ou un objet par ligne
+    (JSON Lines).
+
+    Lève ValueError sur une erreur de syntaxe, ou sur un élément de plus de
+    MAX_RECORD_SIZE caractères.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_BUFFER_SIZE).lstrip()
+
+    if not buffer.startswith('['):
+        # JSON Lines
+        for line in _iter_lines(buffer, file):
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+        return
+
+    position = 1
+    while True:
+        # Avance jusqu'au prochain élément
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer):
+                break
+            chunk = file.read(READ_BUFFER_SIZE)
+            if not chunk:
+                return
+            buffer, position = chunk, 0
+
+        if buffer[position] == ']':
+            return
+
+        try:
+            record, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            # Élément coupé par la lecture : on complète le tampon
+            if not _is_truncated(e, buffer):
+                raise
+            _check_record_size(len(buffer) - position)
+            chunk = file.read(READ_BUFFER_SIZE)
+            if not chunk:
+                raise
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+
+        yield record
+
+
+def _is_truncated(error, buffer):
+    """
+    Vrai si l'erreur de décodage peut venir de la fin du tampon : chaîne non
+    terminée, ou jeton inachevé (nombre, littéral, échappement) jusqu'à la fin.
+    """
+    if error.msg.startswith('Unterminated string'):
+        return True
+    return INCOMPLETE_TOKEN.fullmatch(buffer, error.pos) is not None
+
+
+def _check_record_size(size):
+    if size > MAX_RECORD_SIZE:
+        raise ValueError(f"Élément du rapport de plus de {MAX_RECORD_SIZE} caractères")
+
+
+def _iter_lines(buffer, file):
+    while True:
+        *lines, buffer = buffer.split('\n')
+        yield from lines
+        _check_record_size(len(buffer))
+        chunk = file.read(READ_BUFFER_SIZE)
+        if not chunk:
+            yield buffer
+            return
+        buffer += chunk
+
+
+@dataclass
+class ReportFields:
+    """Noms des colonnes du rapport."""
+    reference: str = 'tx_ref'
+    flutterwave_id: str = 'id'
+    amount: str = 'amount'
+    currency: str = 'currency'
+    status: str = 'status'
+
+
+@dataclass
+class Mismatch:
+    line: int
+    transaction_reference: str
+    flutterwave_transaction_id: str
+    field: str
+    expected: str
+    actual: str
+
+
+@dataclass
+class ReconciliationSummary:
+    records: int = 0
+    matched: int = 0
+    missing: int = 0
+    mismatched: int = 0
+    repaired: int = 0
+    mismatches_by_field: dict = field(default_factory=dict)
+
+
+class Reconciler:
+    """
+    Rapproche un flux d'enregistrements de rapport avec la base.
+
+    Args:
+        chunk_size (int): Nombre de lignes par lot (une requête IN par lot)
+        repair (bool): Passe à leur état final les transactions en cours dont le
+            rapport donne un statut final (un bulk_update par lot) ; les autres
+            écarts de statut sont seulement signalés
+        fields (ReportFields): Noms des colonnes du rapport
+    """
+
+    def __init__(self, chunk_size=1000, repair=False, fields=None):
+        self.chunk_size = chunk_size
+        self.repair = repair
+        self.fields = fields or ReportFields()
+        self.summary = ReconciliationSummary()
+
+    def run(self, records):
+        """
+        Traite tous les enregistrements et produit les écarts au fil de l'eau.
+
+        Yields:
+            Mismatch: Écart constaté (ligne absente, montant, devise ou statut)
+        """
+        numbered = enumerate(records, start=1)
+        while True:
+            chunk = list(islice(numbered, self.chunk_size))
+            if not chunk:
+                return
+            yield from self._reconcile_chunk(chunk)
+            # Avec DEBUG=True, Django conserve chaque requête exécutée
+            reset_queries()
+
+    def _value(self, record, name):
+        value = record.get(getattr(self.fields, name))
+        return '' if value is None else str(value).strip()
+
+    def _load_transactions(self, chunk):
+        references = {self._value(record, 'reference') for _, record in chunk} - {''}
+
+        by_reference = {
+            payment_transaction.transaction_reference: payment_transaction
+            for payment_transaction in self._query_all_databases(
+                transaction_reference__in=references
+            )
+        }
+
+        # Lignes sans référence connue : rapprochement par identifiant Flutterwave
+        flutterwave_ids = {
+            self._value(record, 'flutterwave_id')
+            for _, record in chunk
+            if self._value(record, 'reference') not in by_reference
+        } - {''}
+        by_flutterwave_id = {}
+        if flutterwave_ids:
+            by_flutterwave_id = {
+                payment_transaction.flutterwave_transaction_id: payment_transaction
+                for payment_transaction in self._query_all_databases(
+                    flutterwave_transaction_id__in=flutterwave_ids
+                )
+            }
+        return by_reference, by_flutterwave_id
+
+    @staticmethod
+    def _query_all_databases(**filters):
+        columns = ['id', 'transaction_reference', 'flutterwave_transaction_id', 'amount', 'currency', 'status']
+        results = query_each_database(
+            lambda alias: list(PaymentTransaction.objects.using(alias).filter(**filters).only(*columns))
+        )
+        return [payment_transaction for rows in results.values() for payment_transaction in rows]
+
+    def _reconcile_chunk(self, chunk):
+        by_reference, by_flutterwave_id = self._load_transactions(chunk)
+        to_repair = {}
+
+        for line, record in chunk:
+            self.summary.records += 1
+            reference = self._value(record, 'reference')
+            flutterwave_id = self._value(record, 'flutterwave_id')
+            payment_transaction = by_reference.get(reference) or by_flutterwave_id.get(flutterwave_id)
+
+            if payment_transaction is None:
+                self.summary.missing += 1
+                yield self._mismatch(line, reference, flutterwave_id, 'missing', 'present', '')
+                continue
+
+            self.summary.matched += 1
+            mismatches = list(self._compare(line, record, payment_transaction))
+            if mismatches:
+                self.summary.mismatched += 1
+            yield from mismatches
+
+            # Seules les transactions en cours passent à un état final : un
+            # statut final en base (remboursé, réussi...) n'est jamais modifié
+            expected_status = GATEWAY_STATUSES.get(self._value(record, 'status').lower())
+            if (
+                self.repair
+                and expected_status in PaymentTransaction.TERMINAL_STATUSES
+                and payment_transaction.status not in PaymentTransaction.TERMINAL_STATUSES
+            ):
+                payment_transaction.status = expected_status
+                to_repair[payment_transaction.transaction_reference] = payment_transaction
+
+        if to_repair:
+            self._repair(list(to_repair.values()))
+
+    def _compare(self, line, record, payment_transaction):
+        reference = payment_transaction.transaction_reference
+        flutterwave_id = payment_transaction.flutterwave_transaction_id or ''
+
+        amount = self._value(record, 'amount')
+        try:
+            amount_matches = Decimal(amount) == payment_transaction.amount
+        except InvalidOperation:
+            amount_matches = False
+        if not amount_matches:
+            yield self._mismatch(line, reference, flutterwave_id, 'amount', amount, payment_transaction.amount)
+
+        currency = self._value(record, 'currency').upper()
+        if currency != payment_transaction.currency.upper():
+            yield self._mismatch(line, reference, flutterwave_id, 'currency', currency, payment_transaction.currency)
+
+        gateway_status = self._value(record, 'status')
+        if GATEWAY_STATUSES.get(gateway_status.lower()) != payment_transaction.status:
+            yield self._mismatch(line, reference, flutterwave_id, 'status', gateway_status, payment_transaction.status)
+
+    def _mismatch(self, line, reference, flutterwave_id, field_name, expected, actual):
+        counts = self.summary.mismatches_by_field
+        counts[field_name] = counts.get(field_name, 0) + 1
+        return Mismatch(line, reference, flutterwave_id, field_name, str(expected), str(actual))
+
+    def _repair(self, transactions):
+        now = timezone.now()
+        by_database = defaultdict(list)
+        for payment_transaction in transactions:
+            payment_transaction.updated_at = now
+            by_database[payment_transaction._state.db].append(payment_transaction)
+
+        for alias, database_transactions in by_database.items():
+            with transaction.atomic(using=alias):
+                for payment_transaction in database_transactions:
+                    publish_status(payment_transaction.transaction_reference, payment_transaction.status, using=alias)
+                PaymentTransaction.objects.using(alias).bulk_update(database_transactions, ['status', 'updated_at'])
+        self.summary.repaired += len(transactions)
@@ -0,0 +1,49 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.contrib.auth.models import User
+
+from payments.models import PaymentTransaction
+from payments.sharding import SHARDED_MODELS, get_databases, get_user_shard, is_sharded
+
+
+class ShardRouter:
+    """
+    Routeur des bases (voir payments/sharding.py).
+
+    Les modèles de SHARDED_MODELS (PaymentTransaction) sont répartis entre
+    'default' et les bases de PAYMENTS_SHARDS ; tous les autres modèles
+    restent dans 'default'. Les
+    requêtes sans indication de base vont dans 'default' : le code qui connaît
+    l'utilisateur ou la référence choisit la base avec ``.using()``.
+    """
+
+    def _transaction_db(self, instance):
+        if isinstance(instance, PaymentTransaction):
+            if instance._state.db:
+                return instance._state.db
+            # Nouvelle transaction : base de son utilisateur
+            return get_user_shard(instance.user_id)
+        if isinstance(instance, User):
+            # user.payment_transactions
+            return get_user_shard(instance.pk)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_read(self, model, **hints):
+        if is_sharded(model):
+            return self._transaction_db(hints.get('instance'))
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return self.db_for_read(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Relations entre bases : utilisateur et marchand d'une transaction
+        if is_sharded(obj1) or is_sharded(obj2):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        model = hints.get('model')
+        label = model._meta.label_lower if model is not None else f'{app_label}.{model_name}'
+        if label in SHARDED_MODELS:
+            return db in get_databases()
+        return db == DEFAULT_DB_ALIAS
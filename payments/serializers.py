@@ -1,6 +1,7 @@
 
+from django.conf import settings
 from rest_framework import serializers
-from .models import PaymentTransaction
+from .models import Merchant, PaymentTransaction
 from django.contrib.auth.models import User
 
 
@@ -22,6 +23,7 @@ class PaymentTransactionSerializer(serializers.ModelSerializer):
         write_only=True, 
         required=False
     )
+    merchant = serializers.SlugRelatedField(slug_field='slug', read_only=True)
     
     class Meta:
         model = PaymentTransaction
@@ -29,6 +31,7 @@ class PaymentTransactionSerializer(serializers.ModelSerializer):
             'id', 
             'user', 
             'user_id',
+            'merchant',
             'transaction_reference', 
             'flutterwave_transaction_id',
             'amount', 
@@ -61,6 +64,12 @@ class PaymentInitiationSerializer(serializers.Serializer):
         default='USD'
     )
     customer_email = serializers.EmailField(required=False)
+    # Vide : compte Flutterwave par défaut
+    merchant = serializers.SlugRelatedField(
+        slug_field='slug',
+        queryset=Merchant.objects.filter(is_active=True),
+        required=False
+    )
     
     def validate_amount(self, value):
         """
@@ -71,6 +80,24 @@ class PaymentInitiationSerializer(serializers.Serializer):
         return value
 
 
+class BatchPaymentInitiationSerializer(serializers.Serializer):
+    """Serialiseur pour l'initiation de plusieurs paiements en une requête"""
+    payments = PaymentInitiationSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=settings.PAYMENT_BATCH_MAX_SIZE
+    )
+
+
+class BatchVerificationSerializer(serializers.Serializer):
+    """Serialiseur pour la vérification de plusieurs transactions"""
+    transaction_references = serializers.ListField(
+        child=serializers.CharField(max_length=100),
+        allow_empty=False,
+        max_length=settings.PAYMENT_VERIFY_BATCH_MAX_SIZE
+    )
+
+
 
 class RefundSerializer(serializers.Serializer):
     """Serialiseur pour les demandes de remboursement"""
@@ -1,24 +1,75 @@
 import logging
 import requests
-import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
-from django.db import transaction
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+from payments.events import publish_status
+from payments.gateway import DEFAULT_MERCHANT, merchant_registry
 from payments.models import PaymentTransaction
-from payments.exceptions import PaymentInitiationError, PaymentVerificationError,RefundException
+from payments.sharding import get_user_shard, locate_transaction, make_reference
+from payments.exceptions import PaymentException, PaymentInitiationError, PaymentVerificationError,RefundException
+from payments.throttling import acquire_gateway_budget
 
 logger = logging.getLogger('payments')
 
 class FlutterwavePaymentService:
     def __init__(self):
-        self.base_url = settings.FLUTTERWAVE_BASE_URL
-        self.secret_key = settings.FLUTTERWAVE_SECRET_KEY
+        self.max_concurrency = settings.FLUTTERWAVE_MAX_CONCURRENCY
         
-    def generate_transaction_reference(self):
-        """Génère une référence de transaction unique."""
-        return f"FLW-{uuid.uuid4().hex[:12].upper()}"
+    def generate_transaction_reference(self, shard=DEFAULT_DB_ALIAS):
+        """Génère une référence de transaction unique (qui encode sa base)."""
+        return make_reference(shard)
+
+    def _gateway_request(self, transaction, path, payload=None):
+        """
+        Appelle Flutterwave (POST avec ``payload``, sinon GET) avec le client
+        du marchand de la transaction, après avoir consommé un jeton de son
+        budget d'appels.
+        """
+        merchant = transaction.merchant
+        with merchant_registry.client(merchant) as client:
+            acquire_gateway_budget(
+                f"merchant:{merchant.slug}" if merchant is not None else DEFAULT_MERCHANT
+            )
+            if payload is None:
+                return client.get(path)
+            return client.post(path, payload)
+
+    def _build_payment_payload(self, transaction, user):
+        """Prépare le payload Flutterwave pour une transaction."""
+        return {
+            "tx_ref": transaction.transaction_reference,
+            "amount": str(transaction.amount),
+            "currency": transaction.currency,
+            "payment_options": "card,banktransfer,ussd",
+            "redirect_url": settings.FLUTTERWAVE_REDIRECT_URL,
+            "customer": {
+                "email": transaction.customer_email or user.email,
+                "name": f"{user.first_name} {user.last_name}",
+            },
+            "meta": {
+                "user_id": user.id,
+                # L'identifiant n'est unique que dans sa base
+                "transaction_id": str(transaction.id),
+                "shard": transaction._state.db
+            }
+        }
+
+    def _request_payment_link(self, transaction, payload):
+        """
+        Appelle l'API Flutterwave pour obtenir un lien de paiement.
+
+        Returns:
+            tuple: (succès, données de réponse)
+        """
+        response = self._gateway_request(transaction, "/payments", payload)
+        response_data = response.json()
+        succeeded = response.status_code == 200 and response_data.get('status') == 'success'
+        return succeeded, response_data
     
-    @transaction.atomic
-    def initiate_payment(self, user, amount, currency='USD', customer_details=None):
+    def initiate_payment(self, user, amount, currency='USD', customer_details=None, merchant=None):
         """
         Initie un paiement sécurisé avec enregistrement en base de données.
         
@@ -27,63 +78,49 @@ class FlutterwavePaymentService:
             amount (float): Montant du paiement
             currency (str): Code devise
             customer_details (dict): Détails supplémentaires du client
+            merchant (Merchant, optional): Marchand encaissant le paiement
         
         Returns:
             dict: Détails de la transaction
         """
+        shard = get_user_shard(user.pk, assign=True)
+        with transaction.atomic(using=shard):
+            return self._initiate_payment(shard, user, amount, currency, customer_details, merchant)
+
+    def _initiate_payment(self, shard, user, amount, currency, customer_details, merchant):
         try:
             # Création de l'enregistrement de transaction
-            transaction = PaymentTransaction.objects.create(
+            transaction = PaymentTransaction.objects.using(shard).create(
                 user=user,
+                merchant=merchant,
                 amount=amount,
                 currency=currency,
-                transaction_reference=self.generate_transaction_reference(),
+                transaction_reference=self.generate_transaction_reference(shard),
                 customer_email=customer_details.get('email') if customer_details else None,
                 status=PaymentTransaction.TransactionStatus.INITIATED
             )
             
             # Préparation payload pour Flutterwave
-            payload = {
-                "tx_ref": transaction.transaction_reference,
-                "amount": str(amount),
-                "currency": currency,
-                "payment_options": "card,banktransfer,ussd",
-                "redirect_url": settings.FLUTTERWAVE_REDIRECT_URL,
-                "customer": {
-                    "email": transaction.customer_email or user.email,
-                    "name": f"{user.first_name} {user.last_name}",
-                },
-                "meta": {
-                    "user_id": user.id,
-                    "transaction_id": str(transaction.id)
-                }
-            }
+            payload = self._build_payment_payload(transaction, user)
             
             # Requête à l'API Flutterwave
-            headers = {
-                "Authorization": f"Bearer {self.secret_key}",
-                "Content-Type": "application/json"
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/payments", 
-                json=payload, 
-                headers=headers
-            )
+            succeeded, response_data = self._request_payment_link(transaction, payload)
             
             # Gestion de la réponse
-            response_data = response.json()
-            
-            if response.status_code != 200 or not response_data.get('status') == 'success':
+            if not succeeded:
                 # Mise à jour du statut en cas d'échec
                 transaction.status = PaymentTransaction.TransactionStatus.FAILED
                 transaction.raw_response = response_data
                 transaction.save()
                 
-                logger.error(f"Payment Initiation Failed: {response_data}")
+                error_code = response_data.get('message', 'UNKNOWN_ERROR')
+                logger.error(
+                    "Payment Initiation Failed",
+                    extra={'payload': response_data, 'error_code': error_code, 'transaction_reference': transaction.transaction_reference}
+                )
                 raise PaymentInitiationError(
                     message="Échec de l'initiation du paiement",
-                    error_code=response_data.get('message', 'UNKNOWN_ERROR')
+                    error_code=error_code
                 )
             
             # Mise à jour de la transaction
@@ -91,20 +128,148 @@ class FlutterwavePaymentService:
             transaction.raw_response = response_data
             transaction.status = PaymentTransaction.TransactionStatus.PENDING
             transaction.save()
+            publish_status(transaction.transaction_reference, transaction.status, using=shard)
             
             return {
                 "transaction_reference": transaction.transaction_reference,
                 "payment_link": response_data['data']['link']
             }
         
+        except PaymentException:
+            raise
         except requests.exceptions.RequestException as e:
             logger.exception("Erreur réseau lors de l'initiation du paiement")
             raise PaymentInitiationError(str(e))
         except Exception as e:
             logger.exception("Erreur inattendue lors de l'initiation du paiement")
             raise PaymentInitiationError(str(e))
+
+    def initiate_payments_batch(self, user, payments):
+        """
+        Initie plusieurs paiements en une seule opération.
+
+        Les transactions sont insérées avec un seul ``bulk_create``, Flutterwave
+        est appelé en parallèle (au plus ``FLUTTERWAVE_MAX_CONCURRENCY`` appels
+        simultanés) puis les statuts sont enregistrés avec un seul ``bulk_update``.
+        L'échec d'un paiement n'affecte pas les autres.
+
+        Args:
+            user (User): Utilisateur effectuant les paiements
+            payments (list): Données validées par PaymentInitiationSerializer
+
+        Returns:
+            list: Résultat par paiement, dans l'ordre de la requête
+        """
+        shard = get_user_shard(user.pk, assign=True)
+        transactions = [
+            PaymentTransaction(
+                user=user,
+                merchant=payment.get('merchant'),
+                amount=payment['amount'],
+                currency=payment.get('currency', 'USD'),
+                transaction_reference=self.generate_transaction_reference(shard),
+                customer_email=payment.get('customer_email'),
+                status=PaymentTransaction.TransactionStatus.INITIATED
+            )
+            for payment in payments
+        ]
+        with transaction.atomic(using=shard):
+            PaymentTransaction.objects.using(shard).bulk_create(transactions)
+
+        def call_gateway(payment_transaction):
+            try:
+                return self._request_payment_link(
+                    payment_transaction,
+                    self._build_payment_payload(payment_transaction, user)
+                )
+            except PaymentException as e:
+                # Budget épuisé ou marchand non configuré
+                return None, e.error_code
+            except (requests.exceptions.RequestException, ValueError):
+                logger.exception("Erreur réseau lors de l'initiation du paiement")
+                return None, 'PAYMENT_INITIATION_FAILED'
+            except Exception:
+                # Un paiement en erreur ne doit pas interrompre le lot
+                logger.exception("Erreur inattendue lors de l'initiation du paiement")
+                return None, 'PAYMENT_INITIATION_FAILED'
+
+        # Les appels réseau se font hors transaction base de données
+        workers = max(1, min(self.max_concurrency, len(transactions)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            responses = list(executor.map(call_gateway, transactions))
+
+        now = timezone.now()
+        results = []
+        for index, (payment_transaction, (succeeded, response_data)) in enumerate(zip(transactions, responses)):
+            payment_transaction.updated_at = now
+            result = {
+                "index": index,
+                "transaction_reference": payment_transaction.transaction_reference,
+            }
+
+            data = response_data.get('data') if isinstance(response_data, dict) else None
+            payment_link = data.get('link') if isinstance(data, dict) else None
+            if succeeded and payment_link:
+                payment_transaction.flutterwave_transaction_id = data.get('id')
+                payment_transaction.raw_response = response_data
+                payment_transaction.status = PaymentTransaction.TransactionStatus.PENDING
+                result["payment_link"] = payment_link
+            else:
+                payment_transaction.status = PaymentTransaction.TransactionStatus.FAILED
+                if isinstance(response_data, dict):
+                    payment_transaction.raw_response = response_data
+                    # Réponse « success » sans lien de paiement : échec de ce paiement seulement
+                    error_code = (
+                        'MISSING_PAYMENT_LINK' if succeeded
+                        else response_data.get('message', 'UNKNOWN_ERROR')
+                    )
+                    logger.error(
+                        "Payment Initiation Failed",
+                        extra={'payload': response_data, 'error_code': error_code, 'transaction_reference': payment_transaction.transaction_reference}
+                    )
+                else:
+                    error_code = response_data
+                result["error"] = "Échec de l'initiation du paiement"
+                result["error_code"] = error_code
+
+            result["status"] = payment_transaction.status
+            results.append(result)
+
+        PaymentTransaction.objects.using(shard).bulk_update(
+            transactions,
+            ['status', 'flutterwave_transaction_id', 'raw_response', 'updated_at']
+        )
+        for payment_transaction in transactions:
+            publish_status(payment_transaction.transaction_reference, payment_transaction.status, using=shard)
+        return results
     
-    @transaction.atomic
+    def _request_verification(self, transaction):
+        """
+        Interroge l'API Flutterwave sur l'état d'une transaction.
+
+        Returns:
+            tuple: (succès, données de réponse)
+        """
+        response = self._gateway_request(
+            transaction, f"/transactions/{transaction.flutterwave_transaction_id}/verify"
+        )
+        response_data = response.json()
+        succeeded = response.status_code == 200 and response_data.get('status') == 'success'
+        return succeeded, response_data
+
+    @staticmethod
+    def _get_verified_status(response_data, current_status):
+        """
+        Statut issu d'une vérification réussie ; une transaction encore en
+        cours chez Flutterwave garde son statut actuel.
+        """
+        gateway_status = (response_data.get('data') or {}).get('status')
+        if gateway_status == 'successful':
+            return PaymentTransaction.TransactionStatus.SUCCESSFUL
+        if gateway_status in ('failed', 'cancelled'):
+            return PaymentTransaction.TransactionStatus.FAILED
+        return current_status
+
     def verify_transaction(self, transaction_reference):
         """
         Vérifie une transaction Flutterwave et met à jour son statut.
@@ -116,58 +281,49 @@ class FlutterwavePaymentService:
             dict: Résultat de la vérification
         """
         try:
-            # Récupération de la transaction
-            transaction = PaymentTransaction.objects.get(
-                transaction_reference=transaction_reference
+            # Récupération de la transaction, dans la base encodée dans sa référence
+            payment_transaction = locate_transaction(transaction_reference)
+        except PaymentTransaction.DoesNotExist:
+            logger.error(
+                "Transaction non trouvée",
+                extra={'error_code': 'TRANSACTION_NOT_FOUND', 'transaction_reference': transaction_reference}
             )
-            
-            # Requête de vérification
-            headers = {
-                "Authorization": f"Bearer {self.secret_key}",
-                "Content-Type": "application/json"
-            }
-            
-            response = requests.get(
-                f"{self.base_url}/transactions/{transaction.flutterwave_transaction_id}/verify", 
-                headers=headers
+            raise PaymentVerificationError(
+                message="Transaction introuvable",
+                error_code='TRANSACTION_NOT_FOUND',
+                status_code=404
             )
+
+        with transaction.atomic(using=payment_transaction._state.db):
+            return self._verify_transaction(payment_transaction)
+
+    def _verify_transaction(self, transaction):
+        try:
+            # Requête de vérification
+            succeeded, response_data = self._request_verification(transaction)
             
-            response_data = response.json()
-            
-            if response.status_code != 200 or not response_data.get('status') == 'success':
-                transaction.status = PaymentTransaction.TransactionStatus.FAILED
-                transaction.save()
-                
-                logger.error(f"Transaction Verification Failed: {response_data}")
+            if not succeeded:
+                # Erreur de Flutterwave : le statut en base reste inchangé
+                error_code = response_data.get('message', 'VERIFICATION_FAILED')
+                logger.error(
+                    "Transaction Verification Failed",
+                    extra={'payload': response_data, 'error_code': error_code, 'transaction_reference': transaction.transaction_reference}
+                )
                 raise PaymentVerificationError(
                     message="Échec de la vérification de transaction",
-                    error_code=response_data.get('message', 'VERIFICATION_FAILED')
+                    error_code=error_code
                 )
             
             # Mise à jour du statut
-            data = response_data.get('data', {})
-            transaction.status = (
-                PaymentTransaction.TransactionStatus.SUCCESSFUL 
-                if data.get('status') == 'successful' 
-                else PaymentTransaction.TransactionStatus.FAILED
-            )
+            transaction.status = self._get_verified_status(response_data, transaction.status)
             transaction.raw_response = response_data
             transaction.save()
+            publish_status(transaction.transaction_reference, transaction.status, using=transaction._state.db)
             
-            return {
-                "transaction_reference": transaction.transaction_reference,
-                "status": transaction.status,
-                "amount": transaction.amount,
-                "currency": transaction.currency
-            }
+            return self._verification_result(transaction)
         
-        except PaymentTransaction.DoesNotExist:
-            logger.error(f"Transaction non trouvée: {transaction_reference}")
-            raise PaymentVerificationError(
-                message="Transaction introuvable",
-                error_code='TRANSACTION_NOT_FOUND',
-                status_code=404
-            )
+        except PaymentException:
+            raise
         except requests.exceptions.RequestException as e:
             logger.exception("Erreur réseau lors de la vérification de transaction")
             raise PaymentVerificationError(str(e))
@@ -175,6 +331,102 @@ class FlutterwavePaymentService:
             logger.exception("Erreur inattendue lors de la vérification de transaction")
             raise PaymentVerificationError(str(e))
 
+    def verify_transactions(self, transactions):
+        """
+        Vérifie plusieurs transactions déjà chargées.
+
+        Les transactions dans un état final (ou sans identifiant Flutterwave)
+        sont renvoyées directement depuis la base ; les autres sont vérifiées
+        en parallèle auprès de Flutterwave puis enregistrées avec un seul
+        ``bulk_update``.
+
+        Args:
+            transactions (iterable): Instances de PaymentTransaction (avec
+                ``prefetch_related('merchant')`` pour éviter une requête par marchand),
+                éventuellement de plusieurs bases
+
+        Returns:
+            dict: Résultat de la vérification par référence de transaction
+        """
+        results = {}
+        to_verify = []
+        for payment_transaction in transactions:
+            if (
+                payment_transaction.status in PaymentTransaction.TERMINAL_STATUSES
+                or not payment_transaction.flutterwave_transaction_id
+            ):
+                results[payment_transaction.transaction_reference] = self._verification_result(payment_transaction)
+            else:
+                to_verify.append(payment_transaction)
+
+        if not to_verify:
+            return results
+
+        def call_gateway(payment_transaction):
+            try:
+                return self._request_verification(payment_transaction)
+            except PaymentException as e:
+                # Budget épuisé ou marchand non configuré
+                return None, e.error_code
+            except (requests.exceptions.RequestException, ValueError):
+                logger.exception("Erreur réseau lors de la vérification de transaction")
+                return None, 'PAYMENT_VERIFICATION_FAILED'
+
+        workers = max(1, min(self.max_concurrency, len(to_verify)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            responses = list(executor.map(call_gateway, to_verify))
+
+        now = timezone.now()
+        updated = []
+        for payment_transaction, (succeeded, response_data) in zip(to_verify, responses):
+            reference = payment_transaction.transaction_reference
+
+            if not succeeded:
+                # Erreur réseau, budget épuisé ou erreur de Flutterwave (5xx, 429...) :
+                # le statut en base reste inchangé et sera revérifié
+                if succeeded is None:
+                    error_code = response_data
+                else:
+                    error_code = response_data.get('message', 'VERIFICATION_FAILED')
+                    logger.error(
+                        "Transaction Verification Failed",
+                        extra={'payload': response_data, 'error_code': error_code, 'transaction_reference': reference}
+                    )
+                results[reference] = {
+                    **self._verification_result(payment_transaction),
+                    "error": "Échec de la vérification de transaction",
+                    "error_code": error_code
+                }
+                continue
+
+            payment_transaction.updated_at = now
+            updated.append(payment_transaction)
+            payment_transaction.status = self._get_verified_status(response_data, payment_transaction.status)
+            payment_transaction.raw_response = response_data
+            results[reference] = self._verification_result(payment_transaction)
+
+        # Un bulk_update par base
+        by_database = defaultdict(list)
+        for payment_transaction in updated:
+            by_database[payment_transaction._state.db].append(payment_transaction)
+        for alias, database_transactions in by_database.items():
+            PaymentTransaction.objects.using(alias).bulk_update(
+                database_transactions,
+                ['status', 'raw_response', 'updated_at']
+            )
+            for payment_transaction in database_transactions:
+                publish_status(payment_transaction.transaction_reference, payment_transaction.status, using=alias)
+        return results
+
+    @staticmethod
+    def _verification_result(transaction):
+        return {
+            "transaction_reference": transaction.transaction_reference,
+            "status": transaction.status,
+            "amount": transaction.amount,
+            "currency": transaction.currency
+        }
+
     def refund_transaction(self, transaction, reason=None):
         """
         Effectue un remboursement pour une transaction donnée.
@@ -205,37 +457,33 @@ class FlutterwavePaymentService:
                 )
             
             # Préparation de la requête de remboursement
-            headers = {
-                "Authorization": f"Bearer {self.secret_key}",
-                "Content-Type": "application/json"
-            }
-            
             payload = {
                 "id": transaction.flutterwave_transaction_id,
                 "amount": float(transaction.amount),
                 "reason": reason or "Remboursement standard"
             }
             
-            response = requests.post(
-                f"{self.base_url}/transactions/refund", 
-                json=payload, 
-                headers=headers
-            )
+            response = self._gateway_request(transaction, "/transactions/refund", payload)
             
             response_data = response.json()
             
             # Gestion de la réponse
             if response.status_code != 200 or not response_data.get('status') == 'success':
-                logger.error(f"Refund Failed: {response_data}")
+                error_code = response_data.get('message', 'REFUND_FAILED')
+                logger.error(
+                    "Refund Failed",
+                    extra={'payload': response_data, 'error_code': error_code, 'transaction_reference': transaction.transaction_reference}
+                )
                 raise RefundException(
                     message="Échec du remboursement",
-                    error_code=response_data.get('message', 'REFUND_FAILED')
+                    error_code=error_code
                 )
             
             # Mise à jour du statut de la transaction
             transaction.status = PaymentTransaction.TransactionStatus.REFUNDED
             transaction.raw_response = response_data
             transaction.save()
+            publish_status(transaction.transaction_reference, transaction.status, using=transaction._state.db)
             
             return {
                 "transaction_reference": transaction.transaction_reference,
@@ -244,6 +492,8 @@ class FlutterwavePaymentService:
                 "currency": transaction.currency
             }
         
+        except PaymentException:
+            raise
         except requests.exceptions.RequestException as e:
             logger.exception("Erreur réseau lors du remboursement")
             raise RefundException(str(e))
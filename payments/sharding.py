@@ -0,0 +1,147 @@
+"""
+Sharding des PaymentTransaction par utilisateur.
+
+- Un utilisateur est affecté à une base de settings.PAYMENTS_SHARDS (hachage
+  de son identifiant) lors de sa première transaction. L'affectation est
+  conservée dans UserShard (base 'default') et ne change qu'avec la commande
+  reshard_payments.
+- Les utilisateurs sans affectation (transactions antérieures au sharding)
+  restent dans 'default'.
+- La référence de transaction encode le rang de sa base (FLW-S01-...) :
+  une transaction est retrouvée par sa référence sans interroger toutes les
+  bases.
+- query_each_database et iter_all_databases interrogent toutes les bases
+  (administration, exports, rapprochement).
+"""
+import hashlib
+import heapq
+import re
+import uuid
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from payments.models import PaymentTransaction, UserShard
+
+SHARDED_REFERENCE_RE = re.compile(r'^FLW-S(\d{2})-')
+
+# Modèles répartis entre les bases ('app_label.model_name', comme dans les
+# migrations) ; tous les autres restent dans 'default'
+SHARDED_MODELS = frozenset({PaymentTransaction._meta.label_lower})
+
+
+def sharding_enabled():
+    return bool(settings.PAYMENTS_SHARDS)
+
+
+def is_sharded(model):
+    """Vrai si les lignes du modèle (classe ou modèle historique) sont réparties."""
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+def get_databases():
+    """Toutes les bases contenant des transactions, 'default' en premier."""
+    return list(dict.fromkeys([DEFAULT_DB_ALIAS, *settings.PAYMENTS_SHARDS]))
+
+
+def choose_shard(user_id):
+    """Base d'un nouvel utilisateur, par hachage de son identifiant."""
+    shards = settings.PAYMENTS_SHARDS
+    digest = hashlib.sha1(str(user_id).encode()).digest()
+    return shards[int.from_bytes(digest[:8], 'big') % len(shards)]
+
+
+def get_user_shard(user_id, assign=False):
+    """
+    Retourne la base des transactions d'un utilisateur.
+
+    Args:
+        user_id (int): Identifiant de l'utilisateur
+        assign (bool): Affecte une base à l'utilisateur s'il n'en a pas encore
+    """
+    if not sharding_enabled() or user_id is None:
+        return DEFAULT_DB_ALIAS
+
+    shard = UserShard.objects.filter(user_id=user_id).values_list('shard', flat=True).first()
+    if shard is not None:
+        return shard
+    if not assign:
+        return DEFAULT_DB_ALIAS
+
+    # Un utilisateur qui a déjà des transactions dans 'default' y reste
+    # (reshard_payments peut le déplacer ensuite)
+    if PaymentTransaction.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id).exists():
+        shard = DEFAULT_DB_ALIAS
+    else:
+        shard = choose_shard(user_id)
+    user_shard, _ = UserShard.objects.get_or_create(user_id=user_id, defaults={'shard': shard})
+    return user_shard.shard
+
+
+def make_reference(shard):
+    """Génère une référence de transaction unique qui encode sa base."""
+    token = uuid.uuid4().hex[:12].upper()
+    shards = settings.PAYMENTS_SHARDS
+    if shard in shards:
+        return f"FLW-S{shards.index(shard) + 1:02d}-{token}"
+    return f"FLW-{token}"
+
+
+def shard_for_reference(transaction_reference):
+    """Base encodée dans la référence ('default' pour les anciennes références)."""
+    match = SHARDED_REFERENCE_RE.match(transaction_reference)
+    if match:
+        index = int(match.group(1)) - 1
+        if 0 <= index < len(settings.PAYMENTS_SHARDS):
+            return settings.PAYMENTS_SHARDS[index]
+    return DEFAULT_DB_ALIAS
+
+
+def locate_transaction(transaction_reference, queryset=None):
+    """
+    Retrouve une transaction par sa référence : dans la base encodée dans la
+    référence, puis dans les autres (transaction déplacée par reshard_payments).
+
+    Raises:
+        PaymentTransaction.DoesNotExist: Référence inconnue
+    """
+    if queryset is None:
+        queryset = PaymentTransaction.objects.all()
+
+    home = shard_for_reference(transaction_reference)
+    for alias in [home, *(alias for alias in get_databases() if alias != home)]:
+        payment_transaction = queryset.using(alias).filter(
+            transaction_reference=transaction_reference
+        ).first()
+        if payment_transaction is not None:
+            return payment_transaction
+    raise PaymentTransaction.DoesNotExist(f"Transaction introuvable: {transaction_reference}")
+
+
+def query_each_database(query, databases=None):
+    """
+    Exécute ``query(alias)`` sur chaque base, séquentiellement (pas de
+    parallélisme), avec les connexions du thread courant, réutilisées d'un
+    appel à l'autre.
+
+    Returns:
+        dict: Résultat par base, dans l'ordre des bases
+    """
+    return {alias: query(alias) for alias in databases or get_databases()}
+
+
+def iter_all_databases(queryset, order_by='-created_at', chunk_size=2000):
+    """
+    Parcourt ``queryset`` sur toutes les bases, en flux, fusionné selon
+    ``order_by`` (un seul champ). Fonctionne avec des instances ou .values().
+    """
+    field_name = order_by.lstrip('-')
+
+    def sort_key(row):
+        return row[field_name] if isinstance(row, dict) else getattr(row, field_name)
+
+    iterators = [
+        queryset.using(alias).order_by(order_by).iterator(chunk_size=chunk_size)
+        for alias in get_databases()
+    ]
+    return heapq.merge(*iterators, key=sort_key, reverse=order_by.startswith('-'))
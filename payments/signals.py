@@ -0,0 +1,43 @@
+"""
+Suppressions entre bases.
+
+Les clés étrangères user / merchant des PaymentTransaction n'ont pas de
+contrainte en base (db_constraint=False) et le collecteur de Django ne
+traite que la base de l'objet supprimé ('default'). Ces récepteurs
+appliquent SET_NULL et PROTECT dans les autres bases.
+"""
+from django.contrib.auth.models import User
+from django.db.models import ProtectedError
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from payments.models import Merchant, PaymentTransaction
+from payments.sharding import get_databases
+
+
+def _other_databases(using):
+    return [alias for alias in get_databases() if alias != using]
+
+
+@receiver(pre_delete, sender=User, dispatch_uid='payments_user_set_null')
+def detach_user_transactions(sender, instance, using, **kwargs):
+    """Équivalent de on_delete=SET_NULL dans toutes les bases."""
+    for alias in _other_databases(using):
+        PaymentTransaction.objects.using(alias).filter(user_id=instance.pk).update(user=None)
+
+
+@receiver(pre_delete, sender=Merchant, dispatch_uid='payments_merchant_protect')
+def protect_merchant_transactions(sender, instance, using, **kwargs):
+    """
+    Équivalent de on_delete=PROTECT dans toutes les bases.
+
+    Raises:
+        ProtectedError: Le marchand a des transactions dans une autre base
+    """
+    for alias in _other_databases(using):
+        protected = PaymentTransaction.objects.using(alias).filter(merchant_id=instance.pk)
+        if protected.exists():
+            raise ProtectedError(
+                f"Le marchand {instance.slug} a des transactions dans la base {alias}",
+                set(protected[:10])
+            )
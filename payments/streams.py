@@ -0,0 +1,150 @@
+"""
+Suivi en temps réel du statut d'une transaction.
+
+Vues asynchrones servies par l'application ASGI (config/asgi.py) :
+un flux Server-Sent Events et un long-polling de repli. Une connexion
+inactive n'occupe ni thread ni connexion à la base : elle attend
+simplement un événement publié par payments.events.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .events import broker
+from .models import PaymentTransaction
+from .sharding import get_user_shard
+
+
+@sync_to_async(thread_sensitive=False)
+def _get_transaction_status(request, transaction_reference):
+    """
+    Authentifie la requête (authentifications DRF configurées) et retourne
+    le statut de la transaction de l'utilisateur, ou None si elle n'existe pas.
+    """
+    try:
+        drf_request = Request(
+            request,
+            authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+        )
+        user = drf_request.user
+        if not user or not user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+
+        return PaymentTransaction.objects.using(get_user_shard(user.pk)).filter(
+            user=user,
+            transaction_reference=transaction_reference
+        ).values_list('status', flat=True).first()
+    finally:
+        # La connexion n'est pas conservée pendant l'attente
+        close_old_connections()
+
+
+def _error_response(exc):
+    return JsonResponse({"detail": str(exc.detail)}, status=exc.status_code)
+
+
+def _not_found_response():
+    return JsonResponse(
+        {
+            "error": "Transaction introuvable",
+            "error_code": 'TRANSACTION_NOT_FOUND'
+        },
+        status=404
+    )
+
+
+def _format_event(transaction_reference, status):
+    data = json.dumps({"transaction_reference": transaction_reference, "status": status})
+    return f"event: status\ndata: {data}\n\n".encode()
+
+
+async def _event_stream(subscription, status):
+    with subscription:
+        yield _format_event(subscription.reference, status)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.PAYMENTS_STREAM_MAX_DURATION
+        while status not in PaymentTransaction.TERMINAL_STATUSES:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+
+            new_status = await subscription.wait(
+                min(settings.PAYMENTS_STREAM_HEARTBEAT, remaining)
+            )
+            if new_status is None:
+                # Commentaire SSE : maintient la connexion ouverte via les proxys
+                yield b": keep-alive\n\n"
+            elif new_status != status:
+                status = new_status
+                yield _format_event(subscription.reference, status)
+
+
+@require_GET
+async def transaction_events(request, transaction_reference):
+    """
+    Flux SSE : un événement ``status`` à l'ouverture puis à chaque changement.
+    Le flux se termine lorsque la transaction atteint un statut final.
+    """
+    # Abonnement avant la lecture en base pour ne manquer aucun changement
+    subscription = broker.subscribe(transaction_reference)
+    try:
+        status = await _get_transaction_status(request, transaction_reference)
+    except exceptions.APIException as exc:
+        subscription.close()
+        return _error_response(exc)
+
+    if status is None:
+        subscription.close()
+        return _not_found_response()
+
+    response = StreamingHttpResponse(
+        _event_stream(subscription, status),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_GET
+async def transaction_poll(request, transaction_reference):
+    """
+    Long-polling : répond dès que le statut diffère de ``?status=``,
+    sinon après ``?timeout=`` secondes (plafonné par PAYMENTS_LONGPOLL_TIMEOUT).
+    """
+    known_status = request.GET.get('status')
+    try:
+        timeout = float(request.GET.get('timeout', settings.PAYMENTS_LONGPOLL_TIMEOUT))
+    except ValueError:
+        timeout = settings.PAYMENTS_LONGPOLL_TIMEOUT
+    timeout = max(0, min(timeout, settings.PAYMENTS_LONGPOLL_TIMEOUT))
+
+    with broker.subscribe(transaction_reference) as subscription:
+        try:
+            status = await _get_transaction_status(request, transaction_reference)
+        except exceptions.APIException as exc:
+            return _error_response(exc)
+
+        if status is None:
+            return _not_found_response()
+
+        if status not in PaymentTransaction.TERMINAL_STATUSES:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            while status == known_status and deadline > loop.time():
+                status = await subscription.wait(deadline - loop.time()) or status
+
+    return JsonResponse({
+        "transaction_reference": transaction_reference,
+        "status": status,
+        "changed": status != known_status
+    })
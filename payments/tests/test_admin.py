@@ -0,0 +1,149 @@
+import datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from payments import jobs
+from payments.admin import DateHierarchyQuerySet, EstimatedCountPaginator
+from payments.models import PaymentTransaction
+
+Status = PaymentTransaction.TransactionStatus
+
+
+def aware(*args):
+    return timezone.make_aware(datetime.datetime(*args))
+
+
+# Sans sharding : toutes les transactions dans 'default'
+@override_settings(PAYMENTS_SHARDS=[])
+class AdminTestCase(TestCase):
+
+    def create_transactions(self, count, status=Status.PENDING, created_at=None):
+        transactions = PaymentTransaction.objects.bulk_create([
+            PaymentTransaction(
+                transaction_reference=f'FLW-{status}-{created_at and created_at.date()}-{index}',
+                amount=Decimal('10.00'),
+                status=status
+            )
+            for index in range(count)
+        ])
+        if created_at is not None:
+            # created_at est auto_now_add : date imposée après coup
+            PaymentTransaction.objects.filter(
+                pk__in=[payment_transaction.pk for payment_transaction in transactions]
+            ).update(created_at=created_at)
+        return transactions
+
+
+@override_settings(PAYMENTS_ADMIN_COUNT_LIMIT=3)
+class EstimatedCountPaginatorTests(AdminTestCase):
+
+    def setUp(self):
+        self.create_transactions(4, status=Status.PENDING)
+        self.create_transactions(2, status=Status.FAILED)
+
+    def count(self, queryset):
+        return EstimatedCountPaginator(queryset, per_page=50).count
+
+    def test_unfiltered_uses_table_estimate(self):
+        with mock.patch.object(EstimatedCountPaginator, '_estimate_table_rows', return_value=50000) as estimate:
+            self.assertEqual(self.count(PaymentTransaction.objects.all()), 50000)
+        estimate.assert_called_once()
+
+    def test_small_or_missing_estimate_falls_back_to_capped_count(self):
+        with mock.patch.object(EstimatedCountPaginator, '_estimate_table_rows', return_value=2):
+            self.assertEqual(self.count(PaymentTransaction.objects.all()), 3)
+        # SQLite : pas de statistiques
+        self.assertEqual(self.count(PaymentTransaction.objects.all()), 3)
+
+    def test_filtered_count_is_exact_up_to_limit(self):
+        with mock.patch.object(EstimatedCountPaginator, '_estimate_table_rows') as estimate:
+            self.assertEqual(self.count(PaymentTransaction.objects.filter(status=Status.FAILED)), 2)
+            self.assertEqual(self.count(PaymentTransaction.objects.filter(status=Status.PENDING)), 3)
+        estimate.assert_not_called()
+
+    def test_postgresql_estimate_reads_table_statistics(self):
+        connection = mock.MagicMock(vendor='postgresql')
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = (123456,)
+
+        with mock.patch.dict('payments.admin.connections', {'default': connection}):
+            estimate = EstimatedCountPaginator._estimate_table_rows(PaymentTransaction.objects.all())
+
+        self.assertEqual(estimate, 123456)
+        sql, params = cursor.execute.call_args.args
+        self.assertIn('pg_class', sql)
+        self.assertEqual(params, ['payments_paymenttransaction'])
+
+
+class DateHierarchyTests(AdminTestCase):
+
+    def setUp(self):
+        self.create_transactions(1, created_at=aware(2025, 11, 30, 12))
+        self.create_transactions(2, created_at=aware(2026, 2, 2, 8))
+        self.queryset = DateHierarchyQuerySet(PaymentTransaction)
+
+    def test_years_months_and_days_from_bounds(self):
+        self.assertEqual(
+            list(self.queryset.datetimes('created_at', 'year')),
+            [aware(2025, 1, 1), aware(2026, 1, 1)]
+        )
+        # Les mois sans transaction (décembre, janvier) apparaissent aussi
+        self.assertEqual(
+            list(self.queryset.datetimes('created_at', 'month')),
+            [aware(2025, 11, 1), aware(2025, 12, 1), aware(2026, 1, 1), aware(2026, 2, 1)]
+        )
+        days = list(self.queryset.filter(created_at__year=2026).datetimes('created_at', 'day', order='DESC'))
+        self.assertEqual(days, [aware(2026, 2, 2)])
+
+    def test_no_rows(self):
+        self.assertEqual(self.queryset.filter(status=Status.FAILED).datetimes('created_at', 'month'), [])
+
+    def test_changelist_drill_down(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin_user)
+        url = '/admin/payments/paymenttransaction/'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '?created_at__year=2025')
+        self.assertContains(response, '?created_at__year=2026')
+
+        response = self.client.get(url, {'created_at__year': 2026})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'created_at__month=2')
+        self.assertEqual(len(response.context['cl'].result_list), 2)
+
+        response = self.client.get(url, {'created_at__year': 2026, 'created_at__month': 2})
+        self.assertContains(response, 'created_at__day=2')
+
+
+class AdminActionTests(AdminTestCase):
+
+    def setUp(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin_user)
+
+    def test_actions_submit_background_jobs_with_database(self):
+        successful = self.create_transactions(2, status=Status.SUCCESSFUL)
+        pending = self.create_transactions(1)
+        selected = [str(payment_transaction.pk) for payment_transaction in successful + pending]
+
+        with mock.patch('payments.jobs.submit') as submit:
+            self.client.post('/admin/payments/paymenttransaction/', {
+                'action': 'refund_transactions', '_selected_action': selected
+            })
+            self.client.post('/admin/payments/paymenttransaction/', {
+                'action': 'reverify_transactions', '_selected_action': selected
+            })
+
+        (refund_job, refund_db, refund_ids, reason), (verify_job, verify_db, verify_ids) = [
+            call.args for call in submit.call_args_list
+        ]
+        self.assertEqual((refund_job, refund_db, reason), (jobs.refund_transactions, 'default', "Remboursement administrateur"))
+        self.assertCountEqual(refund_ids, [payment_transaction.pk for payment_transaction in successful])
+        self.assertEqual((verify_job, verify_db), (jobs.reverify_transactions, 'default'))
+        self.assertCountEqual(verify_ids, [int(pk) for pk in selected])
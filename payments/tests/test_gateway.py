@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from payments.exceptions import MerchantConfigurationError
+from payments.gateway import FlutterwaveClient, MerchantRegistry
+from payments.models import Merchant
+
+
+@override_settings(FLUTTERWAVE_SECRET_KEY='sk-default', FLUTTERWAVE_SECRETS_CHECK_INTERVAL=0)
+class MerchantRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.secrets_path = os.path.join(directory.name, 'secrets.json')
+        self.write_secrets({'acme': {'secret_key': 'sk-acme-1'}})
+
+        settings_override = override_settings(FLUTTERWAVE_MERCHANT_SECRETS_FILE=self.secrets_path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.registry = MerchantRegistry(max_clients=2)
+
+    def write_secrets(self, content, mtime_offset=0):
+        with open(self.secrets_path, 'w', encoding='utf-8') as secrets_file:
+            secrets_file.write(content if isinstance(content, str) else json.dumps(content))
+        # Change la date de modification même si l'écriture tombe dans la même seconde
+        stat = os.stat(self.secrets_path)
+        os.utime(self.secrets_path, (stat.st_atime, stat.st_mtime + mtime_offset))
+
+    def authorization(self, merchant=None):
+        with self.registry.client(merchant) as client:
+            return client.session.headers['Authorization']
+
+    def test_default_account_is_separate_from_merchant_named_default(self):
+        self.write_secrets({'default': {'secret_key': 'sk-merchant-default'}}, mtime_offset=10)
+
+        self.assertEqual(self.authorization(), 'Bearer sk-default')
+        self.assertEqual(
+            self.authorization(Merchant(name='Default', slug='default')),
+            'Bearer sk-merchant-default'
+        )
+
+    def test_merchant_without_secret_is_rejected(self):
+        with self.assertRaises(MerchantConfigurationError):
+            self.authorization(Merchant(name='Other', slug='other'))
+
+    def test_rotation_replaces_client(self):
+        acme = Merchant(name='Acme', slug='acme')
+        self.assertEqual(self.authorization(acme), 'Bearer sk-acme-1')
+
+        self.write_secrets({'acme': {'secret_key': 'sk-acme-2'}}, mtime_offset=10)
+        self.assertEqual(self.authorization(acme), 'Bearer sk-acme-2')
+
+    def test_unreadable_secrets_keep_previous_keys(self):
+        acme = Merchant(name='Acme', slug='acme')
+        self.assertEqual(self.authorization(acme), 'Bearer sk-acme-1')
+
+        self.write_secrets('{"acme": {"secret_k', mtime_offset=10)
+        with self.assertLogs('payments', 'ERROR') as logs:
+            self.assertEqual(self.authorization(acme), 'Bearer sk-acme-1')
+        self.assertEqual(logs.records[0].error_code, 'MERCHANT_SECRETS_UNREADABLE')
+
+    def test_replaced_client_is_closed_after_its_requests(self):
+        acme = Merchant(name='Acme', slug='acme')
+        with mock.patch.object(FlutterwaveClient, 'close', autospec=True) as close:
+            with self.registry.client(acme) as old_client:
+                self.write_secrets({'acme': {'secret_key': 'sk-acme-2'}}, mtime_offset=10)
+                self.assertEqual(self.authorization(acme), 'Bearer sk-acme-2')
+                close.assert_not_called()
+            close.assert_called_once_with(old_client)
+
+    def test_evicted_client_is_closed(self):
+        self.write_secrets({
+            'a': {'secret_key': 'sk-a'},
+            'b': {'secret_key': 'sk-b'},
+            'c': {'secret_key': 'sk-c'},
+        }, mtime_offset=10)
+        with self.registry.client(Merchant(name='A', slug='a')) as first_client:
+            pass
+
+        with mock.patch.object(first_client, 'close') as close:
+            self.authorization(Merchant(name='B', slug='b'))
+            self.authorization(Merchant(name='C', slug='c'))
+        close.assert_called_once_with()
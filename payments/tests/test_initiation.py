@@ -0,0 +1,116 @@
+from decimal import Decimal
+from unittest import mock
+
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from payments import throttling
+from payments.models import PaymentTransaction
+
+
+class FakeGatewayResponse:
+
+    def __init__(self, data, status_code=200):
+        self.status_code = status_code
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+def fake_gateway(session, method, url, json=None, **kwargs):
+    """Réponse selon le montant : 13 refusé, 14 sans lien, 15 erreur réseau."""
+    amount = Decimal(json['amount'])
+    if amount == 13:
+        return FakeGatewayResponse({'status': 'error', 'message': 'Invalid amount'}, status_code=400)
+    if amount == 14:
+        return FakeGatewayResponse({'status': 'success', 'data': {'id': 14}})
+    if amount == 15:
+        raise requests.exceptions.ConnectionError("connexion refusée")
+    return FakeGatewayResponse({
+        'status': 'success',
+        'data': {'id': int(amount), 'link': f'https://pay.example/{json["tx_ref"]}'}
+    })
+
+
+# Sans sharding : toutes les transactions dans 'default'
+@override_settings(PAYMENTS_SHARDS=[])
+@mock.patch('requests.Session.request', fake_gateway)
+class BatchInitiationTests(TestCase):
+
+    def setUp(self):
+        # Seaux de limitation neufs pour chaque test
+        throttling.get_store.cache_clear()
+        self.addCleanup(throttling.get_store.cache_clear)
+
+        self.user = User.objects.create_user('customer', 'customer@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def initiate_batch(self, amounts):
+        return self.client.post(
+            '/api/transactions/initiate/batch/',
+            {'payments': [{'amount': amount} for amount in amounts]},
+            format='json'
+        )
+
+    def test_all_payments_succeed(self):
+        response = self.initiate_batch(['10.00', '20.00', '30.00'])
+
+        self.assertEqual(response.status_code, 201, response.data)
+        results = response.data['results']
+        self.assertEqual([result['index'] for result in results], [0, 1, 2])
+        self.assertTrue(all(result['payment_link'] for result in results))
+        self.assertEqual(
+            set(PaymentTransaction.objects.values_list('status', flat=True)),
+            {PaymentTransaction.TransactionStatus.PENDING}
+        )
+        self.assertEqual(
+            sorted(PaymentTransaction.objects.values_list('flutterwave_transaction_id', flat=True)),
+            ['10', '20', '30']
+        )
+
+    def test_partial_failure_returns_207_with_per_item_errors(self):
+        with self.assertLogs('payments', 'ERROR'):
+            response = self.initiate_batch(['10.00', '13.00', '14.00', '15.00'])
+
+        self.assertEqual(response.status_code, 207, response.data)
+        results = response.data['results']
+        self.assertNotIn('error', results[0])
+        self.assertEqual(
+            [result.get('error_code') for result in results[1:]],
+            ['Invalid amount', 'MISSING_PAYMENT_LINK', 'PAYMENT_INITIATION_FAILED']
+        )
+
+        Status = PaymentTransaction.TransactionStatus
+        statuses = dict(PaymentTransaction.objects.values_list('transaction_reference', 'status'))
+        self.assertEqual(
+            [statuses[result['transaction_reference']] for result in results],
+            [Status.PENDING, Status.FAILED, Status.FAILED, Status.FAILED]
+        )
+
+    def test_batch_over_max_size_is_rejected(self):
+        response = self.initiate_batch(['1.00'] * (settings.PAYMENT_BATCH_MAX_SIZE + 1))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('payments', response.data)
+        self.assertFalse(PaymentTransaction.objects.exists())
+
+    def test_statuses_saved_with_single_bulk_update(self):
+        with CaptureQueriesContext(connection) as queries, self.assertLogs('payments', 'ERROR'):
+            response = self.initiate_batch(['10.00', '13.00', '20.00'])
+
+        self.assertEqual(response.status_code, 207)
+        transaction_writes = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith(('INSERT INTO "payments_paymenttransaction"',
+                                        'UPDATE "payments_paymenttransaction"'))
+        ]
+        self.assertEqual(len(transaction_writes), 2)
+        self.assertTrue(transaction_writes[0].startswith('INSERT'))
+        self.assertTrue(transaction_writes[1].startswith('UPDATE'))
@@ -0,0 +1,93 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from payments import jobs, throttling
+from payments.models import PaymentTransaction
+
+Status = PaymentTransaction.TransactionStatus
+
+
+class FakeGatewayResponse:
+
+    def __init__(self, data, status_code=200):
+        self.status_code = status_code
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+def fake_gateway(session, method, url, json=None, **kwargs):
+    if url.endswith('/transactions/refund'):
+        if json['id'] == 'refused':
+            return FakeGatewayResponse({'status': 'error', 'message': 'Refund not allowed'}, status_code=400)
+        return FakeGatewayResponse({'status': 'success', 'data': {'id': 1}})
+    return FakeGatewayResponse({'status': 'success', 'data': {'status': 'successful'}})
+
+
+# Sans sharding : toutes les transactions dans 'default'
+@override_settings(PAYMENTS_SHARDS=[], PAYMENT_VERIFY_BATCH_MAX_SIZE=2)
+@mock.patch('requests.Session.request', fake_gateway)
+class JobTests(TestCase):
+
+    def setUp(self):
+        throttling.get_store.cache_clear()
+        self.addCleanup(throttling.get_store.cache_clear)
+
+    def create_transaction(self, reference, status, flutterwave_id='1'):
+        return PaymentTransaction.objects.create(
+            transaction_reference=reference,
+            flutterwave_transaction_id=flutterwave_id,
+            amount=Decimal('10.00'),
+            status=status
+        )
+
+    def status_of(self, reference):
+        return PaymentTransaction.objects.get(transaction_reference=reference).status
+
+    def test_reverify_transactions_in_chunks(self):
+        transactions = [self.create_transaction(f'FLW-{index}', Status.PENDING) for index in range(5)]
+
+        with mock.patch(
+            'payments.services.FlutterwavePaymentService.verify_transactions', autospec=True,
+            side_effect=lambda service, batch: {}
+        ) as verify_transactions, self.assertLogs('payments', 'INFO'):
+            jobs.reverify_transactions('default', [payment_transaction.pk for payment_transaction in transactions])
+
+        # Lots de PAYMENT_VERIFY_BATCH_MAX_SIZE transactions
+        self.assertEqual([len(call.args[1]) for call in verify_transactions.call_args_list], [2, 2, 1])
+
+    def test_reverify_transactions_updates_statuses(self):
+        transactions = [self.create_transaction(f'FLW-{index}', Status.PENDING) for index in range(3)]
+
+        with self.assertLogs('payments', 'INFO'):
+            jobs.reverify_transactions('default', [payment_transaction.pk for payment_transaction in transactions])
+
+        self.assertEqual(
+            set(PaymentTransaction.objects.values_list('status', flat=True)), {Status.SUCCESSFUL}
+        )
+
+    def test_refund_transactions_skips_failures(self):
+        self.create_transaction('FLW-OK', Status.SUCCESSFUL)
+        self.create_transaction('FLW-REFUSED', Status.SUCCESSFUL, flutterwave_id='refused')
+        self.create_transaction('FLW-PENDING', Status.PENDING)
+
+        with self.assertLogs('payments', 'INFO') as logs:
+            jobs.refund_transactions('default', list(PaymentTransaction.objects.values_list('pk', flat=True)))
+
+        self.assertEqual(self.status_of('FLW-OK'), Status.REFUNDED)
+        self.assertEqual(self.status_of('FLW-REFUSED'), Status.SUCCESSFUL)
+        self.assertEqual(self.status_of('FLW-PENDING'), Status.PENDING)
+        self.assertEqual(logs.records[-1].getMessage(), "Remboursement terminé : 1/3 transactions")
+
+    def test_failing_job_is_logged(self):
+        def job(value):
+            raise RuntimeError(value)
+
+        with self.assertLogs('payments', 'ERROR') as logs:
+            jobs._run(job, 'boom')
+
+        self.assertEqual(logs.records[0].getMessage(), "Échec de la tâche de fond job")
+        self.assertIsNotNone(logs.records[0].exc_info)
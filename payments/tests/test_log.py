@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from payments.log import (
+    REDACTED, AsyncQueueHandler, ErrorSamplingFilter, RedactingJsonFormatter, redact
+)
+
+
+def make_record(msg='message', args=(), level=logging.ERROR, exc_info=None, **extra):
+    record = logging.LogRecord('payments', level, __file__, 1, msg, args, exc_info)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+class CollectingHandler(logging.Handler):
+    """Handler d'écriture des tests : garde les enregistrements en mémoire."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class RedactionTests(SimpleTestCase):
+
+    def test_redacts_sensitive_keys_recursively(self):
+        payload = {
+            'status': 'success',
+            'customer': {'email': 'a@example.com', 'name': 'Ada'},
+            'card': {'number': '4242'},
+            'X-Secret-Header': 'value',
+            'data': [{'account_number': '0123', 'amount': 10}],
+        }
+        self.assertEqual(redact(payload), {
+            'status': 'success',
+            'customer': {'email': REDACTED, 'name': REDACTED},
+            'card': REDACTED,
+            'X-Secret-Header': REDACTED,
+            'data': [{'account_number': REDACTED, 'amount': 10}],
+        })
+        # L'original n'est pas modifié
+        self.assertEqual(payload['customer']['email'], 'a@example.com')
+
+    def test_redacts_secrets_inside_strings(self):
+        self.assertEqual(
+            redact('key FLWSECK_TEST-abc123-X, Bearer sk-live and ada@example.com'),
+            f'key {REDACTED}, {REDACTED} and {REDACTED}'
+        )
+
+    def test_formatter_redacts_arguments_extras_and_traceback(self):
+        try:
+            raise ValueError('FLWSECK-secret')
+        except ValueError:
+            record = make_record(
+                "Réponse %s pour %s", ({'token': 't'}, 'ada@example.com'),
+                exc_info=sys.exc_info(),
+                error_code='E1', payload={'password': 'p', 'amount': 5}
+            )
+        record.exc_text = logging.Formatter().formatException(record.exc_info)
+
+        data = json.loads(RedactingJsonFormatter().format(record))
+
+        self.assertEqual(data['message'], f"Réponse {{'token': '{REDACTED}'}} pour {REDACTED}")
+        self.assertEqual(data['error_code'], 'E1')
+        self.assertEqual(data['payload'], {'password': REDACTED, 'amount': 5})
+        self.assertNotIn('FLWSECK-secret', data['exception'])
+
+
+class ErrorSamplingFilterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        clock = mock.patch('payments.log.time.monotonic', lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.sampling = ErrorSamplingFilter(burst=2, interval=60)
+
+    def test_keeps_burst_then_reports_suppressed_count(self):
+        records = [make_record(error_code='GATEWAY_DOWN') for _ in range(5)]
+        self.assertEqual([self.sampling.filter(record) for record in records], [True, True, False, False, False])
+
+        self.now += 60
+        record = make_record(error_code='GATEWAY_DOWN')
+        self.assertTrue(self.sampling.filter(record))
+        self.assertEqual(record.suppressed, 3)
+
+    def test_keys_and_levels(self):
+        for _ in range(2):
+            self.sampling.filter(make_record(error_code='A'))
+        self.assertFalse(self.sampling.filter(make_record(error_code='A')))
+        # Autre error_code, autre gabarit de message, niveau inférieur : non limités
+        self.assertTrue(self.sampling.filter(make_record(error_code='B')))
+        self.assertTrue(self.sampling.filter(make_record('Autre message')))
+        self.assertTrue(self.sampling.filter(make_record(error_code='A', level=logging.WARNING)))
+
+    def test_tracked_keys_are_bounded(self):
+        sampling = ErrorSamplingFilter(burst=1, max_keys=3)
+        for index in range(10):
+            sampling.filter(make_record(error_code=f'E{index}'))
+        self.assertEqual(list(sampling._windows), [('payments', f'E{index}') for index in (7, 8, 9)])
+
+
+class AsyncQueueHandlerTests(SimpleTestCase):
+
+    def make_handler(self, queue_size=100):
+        handler = AsyncQueueHandler(
+            target='payments.tests.test_log.CollectingHandler',
+            queue_size=queue_size
+        )
+        self.addCleanup(handler.close)
+        return handler
+
+    def test_queue_full_drops_are_counted_on_next_record(self):
+        handler = self.make_handler(queue_size=1)
+        with mock.patch.object(handler, '_start_listener'):
+            for _ in range(4):
+                handler.handle(make_record())
+
+            self.assertEqual(handler._dropped, 3)
+            handler.queue.get_nowait()
+            handler.handle(make_record('après'))
+
+        self.assertEqual(handler.queue.get_nowait().dropped, 3)
+        self.assertEqual(handler._dropped, 0)
+
+    def test_drop_count_is_kept_when_reporting_record_is_dropped(self):
+        handler = self.make_handler(queue_size=1)
+        with mock.patch.object(handler, '_start_listener'):
+            handler.handle(make_record())
+            handler.handle(make_record())
+            # File toujours pleine : le compte reporté est remis de côté
+            handler.handle(make_record())
+        self.assertEqual(handler._dropped, 2)
+
+    def test_concurrent_drops_are_all_counted(self):
+        handler = self.make_handler(queue_size=1)
+        threads_count, records_per_thread = 8, 500
+
+        def emit():
+            for _ in range(records_per_thread):
+                handler.enqueue(make_record())
+
+        with mock.patch.object(handler, '_start_listener'):
+            threads = [threading.Thread(target=emit) for _ in range(threads_count)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(handler._dropped + handler.queue.qsize(), threads_count * records_per_thread)
+
+    def test_listener_starts_lazily_and_close_flushes(self):
+        handler = self.make_handler()
+        self.assertIsNone(handler.listener)
+
+        handler.handle(make_record('premier'))
+        self.assertEqual(handler._listener_pid, os.getpid())
+        self.assertTrue(handler.listener._thread.is_alive())
+        listener = handler.listener
+
+        handler.handle(make_record('second'))
+        self.assertIs(handler.listener, listener)
+
+        handler.close()
+        self.assertIsNone(listener._thread)
+        self.assertEqual([record.getMessage() for record in handler.target.records], ['premier', 'second'])
+
+    def test_fork_hook_is_registered_once(self):
+        with mock.patch('os.register_at_fork') as register_at_fork:
+            self.make_handler()
+            self.make_handler()
+        register_at_fork.assert_not_called()
+
+    def test_after_fork_resets_listener(self):
+        handler = self.make_handler()
+        handler.handle(make_record())
+        parent_listener, parent_queue = handler.listener, handler.queue
+        self.addCleanup(parent_listener.stop)
+
+        handler._after_fork()
+
+        self.assertIsNone(handler.listener)
+        self.assertIsNot(handler.queue, parent_queue)
+        handler.handle(make_record())
+        self.assertIsNot(handler.listener, parent_listener)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "fork indisponible")
+    def test_forked_child_writes_its_records(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'payments.log')
+        handler = AsyncQueueHandler(target='logging.FileHandler', target_kwargs={'filename': path})
+        self.addCleanup(handler.close)
+        handler.handle(make_record('parent'))
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                handler.handle(make_record('enfant'))
+                handler.close()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        handler.close()
+
+        with open(path, encoding='utf-8') as log_file:
+            self.assertEqual(sorted(log_file.read().split()), ['enfant', 'parent'])
@@ -0,0 +1,89 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from config import openapi
+
+
+class OpenApiSchemaTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.schema_dir = directory.name
+
+        settings_override = override_settings(
+            OPENAPI_SCHEMA_DIR=self.schema_dir, OPENAPI_SCHEMA_GENERATE_ON_MISS=False
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        cache_patch = mock.patch.dict(openapi._cache, clear=True)
+        cache_patch.start()
+        self.addCleanup(cache_patch.stop)
+
+    def generate(self):
+        call_command('generate_openapi_schema', format=['json'], stdout=mock.Mock())
+
+    def test_command_writes_schema_file(self):
+        self.generate()
+
+        with open(os.path.join(self.schema_dir, 'schema.json'), encoding='utf-8') as schema_file:
+            schema = json.load(schema_file)
+        self.assertIn('/transactions/', schema['paths'])
+        self.assertFalse(os.path.exists(os.path.join(self.schema_dir, 'schema.json.tmp')))
+
+    def test_schema_is_served_with_cache_headers(self):
+        self.generate()
+
+        response = self.client.get('/swagger.json/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertTrue(response['ETag'])
+        self.assertTrue(response['Last-Modified'])
+        self.assertIn(f'max-age={settings.OPENAPI_SCHEMA_MAX_AGE}', response['Cache-Control'])
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_if_none_match_returns_304(self):
+        self.generate()
+        etag = self.client.get('/swagger.json/')['ETag']
+
+        response = self.client.get('/swagger.json/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_missing_schema_returns_404(self):
+        self.assertEqual(self.client.get('/swagger.json/').status_code, 404)
+        self.assertEqual(self.client.get('/swagger.xml/').status_code, 404)
+
+    def test_ui_disabled_keeps_drf_yasg_unimported(self):
+        # Processus séparé : drf_yasg est déjà importé dans celui des tests
+        code = (
+            "import sys, django; django.setup(); "
+            "from django.test import Client; import config.urls; "
+            "Client().get('/swagger.json/'); "
+            "print('drf_yasg' in sys.modules)"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                'DJANGO_SETTINGS_MODULE': 'config.settings',
+                'OPENAPI_UI_ENABLED': 'False',
+                'OPENAPI_SCHEMA_DIR': self.schema_dir,
+            },
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(result.stdout.strip().splitlines()[-1], 'False', result.stderr)
@@ -0,0 +1,154 @@
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from payments import reconciliation
+from payments.models import PaymentTransaction
+from payments.reconciliation import Reconciler, iter_csv_records, iter_json_records
+
+
+class ReportParserTests(TestCase):
+    records = [
+        {'tx_ref': f'FLW-{index:04d}', 'id': index, 'amount': '10.00', 'currency': 'USD', 'status': 'successful'}
+        for index in range(50)
+    ]
+
+    def test_csv(self):
+        report = io.StringIO("tx_ref,id,amount\nFLW-1,1,10.00\nFLW-2,2,5.50\n")
+        self.assertEqual(
+            list(iter_csv_records(report)),
+            [{'tx_ref': 'FLW-1', 'id': '1', 'amount': '10.00'}, {'tx_ref': 'FLW-2', 'id': '2', 'amount': '5.50'}]
+        )
+
+    def test_json_array(self):
+        report = io.StringIO(json.dumps(self.records, indent=2))
+        self.assertEqual(list(iter_json_records(report)), self.records)
+
+    def test_json_array_records_split_across_reads(self):
+        report = io.StringIO(json.dumps(self.records))
+        with mock.patch.object(reconciliation, 'READ_BUFFER_SIZE', 7):
+            self.assertEqual(list(iter_json_records(report)), self.records)
+
+    def test_json_lines(self):
+        report = io.StringIO('\n'.join(json.dumps(record) for record in self.records) + '\n\n')
+        with mock.patch.object(reconciliation, 'READ_BUFFER_SIZE', 16):
+            self.assertEqual(list(iter_json_records(report)), self.records)
+
+    def test_empty_json_array(self):
+        self.assertEqual(list(iter_json_records(io.StringIO(' [ ] '))), [])
+
+    def test_json_array_syntax_error_fails_without_reading_the_rest(self):
+        report = io.StringIO('[{"tx_ref": "FLW-1"}, {"tx_ref" "FLW-2"}, ' + '{"id": 1}, ' * 1000 + ']')
+        with mock.patch.object(reconciliation, 'READ_BUFFER_SIZE', 64):
+            records = iter_json_records(report)
+            self.assertEqual(next(records), {'tx_ref': 'FLW-1'})
+            with self.assertRaises(json.JSONDecodeError):
+                next(records)
+        self.assertEqual(report.tell(), 64)
+
+    def test_json_array_oversized_record_is_rejected(self):
+        # Chaîne jamais terminée : le tampon ne doit pas grossir sans limite
+        report = io.StringIO('[{"tx_ref": "' + 'x' * 10000)
+        with mock.patch.multiple(reconciliation, READ_BUFFER_SIZE=64, MAX_RECORD_SIZE=256):
+            with self.assertRaisesMessage(ValueError, "plus de 256 caractères"):
+                list(iter_json_records(report))
+        self.assertLess(report.tell(), 512)
+
+    def test_json_lines_oversized_line_is_rejected(self):
+        report = io.StringIO('{"tx_ref": "FLW-1"}\n' + 'x' * 10000)
+        with mock.patch.multiple(reconciliation, READ_BUFFER_SIZE=64, MAX_RECORD_SIZE=256):
+            records = iter_json_records(report)
+            self.assertEqual(next(records), {'tx_ref': 'FLW-1'})
+            with self.assertRaisesMessage(ValueError, "plus de 256 caractères"):
+                next(records)
+        self.assertLess(report.tell(), 512)
+
+    def test_reconcile_command_reports_invalid_json(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as report:
+            report.write('[{"tx_ref": "FLW-1",}]')
+        self.addCleanup(os.remove, report.name)
+        output = report.name + '.csv'
+        self.addCleanup(os.remove, output)
+
+        with self.assertRaisesMessage(CommandError, "Rapport invalide"):
+            call_command('reconcile_settlement', report.name, output=output, stderr=io.StringIO())
+
+
+class ReconcilerTests(TestCase):
+    databases = '__all__'
+
+    def create_transaction(self, reference, status, amount='10.00', flutterwave_id=None):
+        return PaymentTransaction.objects.create(
+            transaction_reference=reference,
+            flutterwave_transaction_id=flutterwave_id,
+            amount=Decimal(amount),
+            currency='USD',
+            status=status
+        )
+
+    @staticmethod
+    def record(reference, status, amount='10.00', flutterwave_id=''):
+        return {'tx_ref': reference, 'id': flutterwave_id, 'amount': amount, 'currency': 'USD', 'status': status}
+
+    def test_matches_and_reports_mismatches(self):
+        Status = PaymentTransaction.TransactionStatus
+        self.create_transaction('FLW-OK', Status.SUCCESSFUL)
+        self.create_transaction('FLW-AMOUNT', Status.SUCCESSFUL, amount='9.00')
+        self.create_transaction('FLW-BYID', Status.FAILED, flutterwave_id='42')
+
+        reconciler = Reconciler(chunk_size=2)
+        mismatches = list(reconciler.run([
+            self.record('FLW-OK', 'successful'),
+            self.record('FLW-AMOUNT', 'successful'),
+            self.record('', 'failed', flutterwave_id='42'),
+            self.record('FLW-MISSING', 'successful'),
+        ]))
+
+        self.assertEqual(
+            [(mismatch.line, mismatch.transaction_reference, mismatch.field) for mismatch in mismatches],
+            [(2, 'FLW-AMOUNT', 'amount'), (4, 'FLW-MISSING', 'missing')]
+        )
+        summary = reconciler.summary
+        self.assertEqual((summary.records, summary.matched, summary.missing, summary.mismatched), (4, 3, 1, 1))
+
+    def test_repair_moves_pending_transactions_to_final_status(self):
+        Status = PaymentTransaction.TransactionStatus
+        self.create_transaction('FLW-PENDING', Status.PENDING)
+        self.create_transaction('FLW-INITIATED', Status.INITIATED)
+
+        reconciler = Reconciler(repair=True)
+        list(reconciler.run([
+            self.record('FLW-PENDING', 'successful'),
+            self.record('FLW-INITIATED', 'failed'),
+        ]))
+
+        self.assertEqual(reconciler.summary.repaired, 2)
+        self.assertEqual(PaymentTransaction.objects.get(transaction_reference='FLW-PENDING').status, Status.SUCCESSFUL)
+        self.assertEqual(PaymentTransaction.objects.get(transaction_reference='FLW-INITIATED').status, Status.FAILED)
+
+    def test_repair_never_moves_final_status_backwards(self):
+        Status = PaymentTransaction.TransactionStatus
+        self.create_transaction('FLW-REFUNDED', Status.REFUNDED)
+        self.create_transaction('FLW-SUCCESSFUL', Status.SUCCESSFUL)
+        self.create_transaction('FLW-STILL-PENDING', Status.PENDING)
+
+        reconciler = Reconciler(repair=True)
+        mismatches = list(reconciler.run([
+            self.record('FLW-REFUNDED', 'successful'),
+            self.record('FLW-SUCCESSFUL', 'pending'),
+            self.record('FLW-STILL-PENDING', 'pending'),
+        ]))
+
+        self.assertEqual(
+            [(mismatch.transaction_reference, mismatch.field) for mismatch in mismatches],
+            [('FLW-REFUNDED', 'status'), ('FLW-SUCCESSFUL', 'status')]
+        )
+        self.assertEqual(reconciler.summary.repaired, 0)
+        self.assertEqual(PaymentTransaction.objects.get(transaction_reference='FLW-REFUNDED').status, Status.REFUNDED)
+        self.assertEqual(PaymentTransaction.objects.get(transaction_reference='FLW-SUCCESSFUL').status, Status.SUCCESSFUL)
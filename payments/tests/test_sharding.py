@@ -0,0 +1,330 @@
+import csv
+import io
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.db.models import ProtectedError
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from payments.management.commands import reshard_payments
+from payments.models import Merchant, PaymentTransaction, UserShard
+from payments.routers import ShardRouter
+from payments.services import FlutterwavePaymentService
+from payments.sharding import get_user_shard, locate_transaction, make_reference, shard_for_reference
+
+SHARDS = ['shard01', 'shard02']
+
+
+class FakeGatewayResponse:
+
+    def __init__(self, data, status_code=200):
+        self.status_code = status_code
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+def fake_gateway(session, method, url, **kwargs):
+    if url.endswith('/payments'):
+        return FakeGatewayResponse({'status': 'success', 'data': {'id': 7, 'link': 'https://pay.example/7'}})
+    return FakeGatewayResponse({'status': 'success', 'data': {'status': 'successful'}})
+
+
+@skipUnless(
+    set(SHARDS) <= set(settings.DATABASES),
+    "Bases de shard non déclarées : python manage.py test --settings=config.test_settings"
+)
+@override_settings(PAYMENTS_SHARDS=SHARDS)
+class ShardedTestCase(TestCase):
+    databases = '__all__'
+
+    def create_user(self, username, shard):
+        user = User.objects.create_user(username, f'{username}@example.com', 'password')
+        UserShard.objects.create(user=user, shard=shard)
+        return user
+
+    def create_transaction(self, user, shard, reference=None, **fields):
+        return PaymentTransaction.objects.using(shard).create(
+            user=user,
+            transaction_reference=reference or make_reference(shard),
+            amount=fields.pop('amount', Decimal('10.00')),
+            **fields
+        )
+
+
+class RouterTests(ShardedTestCase):
+
+    def setUp(self):
+        self.router = ShardRouter()
+        self.user = self.create_user('customer', 'shard02')
+
+    def test_new_transaction_goes_to_user_shard(self):
+        payment_transaction = PaymentTransaction(user=self.user)
+        self.assertEqual(
+            self.router.db_for_write(PaymentTransaction, instance=payment_transaction), 'shard02'
+        )
+        self.assertEqual(self.router.db_for_read(PaymentTransaction, instance=self.user), 'shard02')
+
+    def test_unassigned_user_and_other_models_stay_in_default(self):
+        legacy_user = User.objects.create_user('legacy')
+        self.assertEqual(get_user_shard(legacy_user.pk), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.router.db_for_read(PaymentTransaction), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.router.db_for_write(Merchant), DEFAULT_DB_ALIAS)
+
+    def test_allow_migrate(self):
+        self.assertTrue(self.router.allow_migrate('shard01', 'payments', 'paymenttransaction'))
+        self.assertFalse(self.router.allow_migrate('shard01', 'payments', 'merchant'))
+        self.assertFalse(self.router.allow_migrate('shard01', 'auth', 'user'))
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'auth', 'user'))
+        # Opérations avec le modèle en indication (RunPython, RunSQL) ou sans modèle
+        self.assertTrue(self.router.allow_migrate('shard01', 'payments', model=PaymentTransaction))
+        self.assertFalse(self.router.allow_migrate('shard01', 'payments', model=UserShard))
+        self.assertFalse(self.router.allow_migrate('shard01', 'payments'))
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'payments'))
+
+
+@skipUnless('shard01' in settings.DATABASES, "Bases de shard non déclarées")
+@override_settings(PAYMENTS_SHARDS=SHARDS)
+class ShardMigrationTests(TransactionTestCase):
+    # Hors transaction : l'éditeur de schéma SQLite ne s'utilise pas dans un atomic()
+    databases = '__all__'
+
+    def test_shard_migrations_create_no_foreign_keys(self):
+        # auth_user et payments_merchant n'existent que dans 'default' :
+        # aucune contrainte vers ces tables dans les bases de shard
+        loader = MigrationLoader(None)
+        migrations = sorted(name for app_label, name in loader.disk_migrations if app_label == 'payments')
+        for name in migrations:
+            output = io.StringIO()
+            call_command('sqlmigrate', 'payments', name, database='shard01', stdout=output)
+            with self.subTest(migration=name):
+                self.assertNotIn('REFERENCES', output.getvalue())
+
+
+class ReferenceTests(ShardedTestCase):
+
+    def test_reference_encodes_shard(self):
+        reference = make_reference('shard02')
+        self.assertRegex(reference, r'^FLW-S02-[0-9A-F]{12}$')
+        self.assertEqual(shard_for_reference(reference), 'shard02')
+
+    def test_legacy_and_unknown_references_map_to_default(self):
+        self.assertRegex(make_reference(DEFAULT_DB_ALIAS), r'^FLW-[0-9A-F]{12}$')
+        self.assertEqual(shard_for_reference('FLW-ABCDEF123456'), DEFAULT_DB_ALIAS)
+        self.assertEqual(shard_for_reference('FLW-S09-ABCDEF123456'), DEFAULT_DB_ALIAS)
+
+    def test_locate_transaction_falls_back_to_other_databases(self):
+        user = self.create_user('customer', 'shard02')
+        # Référence de shard01, transaction déplacée dans shard02
+        moved = self.create_transaction(user, 'shard02', reference=make_reference('shard01'))
+
+        located = locate_transaction(moved.transaction_reference)
+        self.assertEqual((located.pk, located._state.db), (moved.pk, 'shard02'))
+        with self.assertRaises(PaymentTransaction.DoesNotExist):
+            locate_transaction(make_reference('shard01'))
+
+
+@mock.patch('requests.Session.request', fake_gateway)
+class ShardedApiTests(ShardedTestCase):
+
+    def setUp(self):
+        self.user = self.create_user('customer', 'shard02')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_initiate_verify_and_list_use_user_shard(self):
+        response = self.client.post('/api/transactions/initiate/', {'amount': '10.00'}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        reference = response.data['transaction_reference']
+        self.assertEqual(shard_for_reference(reference), 'shard02')
+        self.assertTrue(PaymentTransaction.objects.using('shard02').filter(transaction_reference=reference).exists())
+        self.assertFalse(PaymentTransaction.objects.using(DEFAULT_DB_ALIAS).exists())
+
+        response = self.client.get(f'/api/transactions/verify/{reference}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            PaymentTransaction.objects.using('shard02').get(transaction_reference=reference).status,
+            PaymentTransaction.TransactionStatus.SUCCESSFUL
+        )
+
+        self.create_transaction(self.user, 'shard02')
+        response = self.client.get('/api/transactions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+    def test_new_user_is_assigned_a_shard(self):
+        user = User.objects.create_user('newcomer')
+        self.client.force_authenticate(user)
+
+        response = self.client.post('/api/transactions/initiate/', {'amount': '5.00'}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        shard = UserShard.objects.get(user=user).shard
+        self.assertIn(shard, SHARDS)
+        self.assertEqual(shard_for_reference(response.data['transaction_reference']), shard)
+
+
+class ReshardTests(ShardedTestCase):
+
+    def setUp(self):
+        self.user = self.create_user('customer', 'shard01')
+        self.transactions = [self.create_transaction(self.user, 'shard01') for _ in range(3)]
+
+    def rows(self, shard):
+        return list(
+            PaymentTransaction.objects.using(shard).filter(user=self.user).order_by(
+                'transaction_reference'
+            ).values_list('transaction_reference', 'status', 'created_at', 'updated_at')
+        )
+
+    def reshard(self):
+        call_command('reshard_payments', users=[self.user.pk], target='shard02', grace=0, stdout=mock.Mock())
+
+    def test_moves_transactions_and_assignment(self):
+        before = self.rows('shard01')
+
+        self.reshard()
+
+        self.assertEqual(self.rows('shard02'), before)
+        self.assertEqual(self.rows('shard01'), [])
+        self.assertEqual(get_user_shard(self.user.pk), 'shard02')
+        reference = self.transactions[0].transaction_reference
+        self.assertEqual(locate_transaction(reference)._state.db, 'shard02')
+
+    def test_rows_inserted_after_last_copy_are_not_lost(self):
+        copy = reshard_payments.Command._copy
+        copies = []
+        late_transactions = []
+
+        def copy_then_insert(command, user_id, source, target, updated_since=None):
+            copied = copy(command, user_id, source, target, updated_since=updated_since)
+            copies.append(updated_since)
+            if len(copies) == 3:
+                # Copie initiale, resynchronisation, puis copie sous verrou :
+                # insertion concurrente juste avant la suppression
+                late_transactions.append(self.create_transaction(self.user, 'shard01'))
+            return copied
+
+        with mock.patch.object(reshard_payments.Command, '_copy', copy_then_insert):
+            self.reshard()
+
+        self.assertEqual(self.rows('shard01'), [])
+        self.assertTrue(
+            PaymentTransaction.objects.using('shard02').filter(
+                transaction_reference=late_transactions[0].transaction_reference
+            ).exists()
+        )
+
+
+class ExportTests(ShardedTestCase):
+
+    def test_exports_every_database_newest_first(self):
+        legacy_user = User.objects.create_user('legacy')
+        self.create_transaction(legacy_user, DEFAULT_DB_ALIAS, reference='FLW-LEGACY000001')
+        self.create_transaction(self.create_user('first', 'shard01'), 'shard01')
+        self.create_transaction(self.create_user('second', 'shard02'), 'shard02')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.csv')
+            call_command('export_payments', output=path, stderr=mock.Mock())
+            with open(path, newline='', encoding='utf-8') as export_file:
+                rows = list(csv.DictReader(export_file))
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(
+            {shard_for_reference(row['transaction_reference']) for row in rows},
+            {DEFAULT_DB_ALIAS, 'shard01', 'shard02'}
+        )
+        created = [row['created_at'] for row in rows]
+        self.assertEqual(created, sorted(created, reverse=True))
+
+
+class CrossShardDeleteTests(ShardedTestCase):
+
+    def test_deleting_user_detaches_transactions_on_every_shard(self):
+        user = self.create_user('customer', 'shard02')
+        payment_transaction = self.create_transaction(user, 'shard02')
+
+        user.delete()
+
+        payment_transaction.refresh_from_db()
+        self.assertIsNone(payment_transaction.user_id)
+
+    def test_merchant_with_transactions_on_a_shard_is_protected(self):
+        merchant = Merchant.objects.create(name='Acme', slug='acme')
+        self.create_transaction(self.create_user('customer', 'shard01'), 'shard01', merchant=merchant)
+
+        with self.assertRaises(ProtectedError), transaction.atomic():
+            merchant.delete()
+        self.assertTrue(Merchant.objects.filter(pk=merchant.pk).exists())
+
+
+class AdminSearchTests(ShardedTestCase):
+
+    def setUp(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin_user)
+
+    def test_search_finds_transactions_outside_default(self):
+        payment_transaction = self.create_transaction(
+            self.create_user('customer', 'shard02'), 'shard02', customer_email='customer@example.com'
+        )
+
+        response = self.client.get('/admin/payments/paymenttransaction/', {'q': 'customer@example.com'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, payment_transaction.transaction_reference)
+
+
+class AdminChangeViewTests(ShardedTestCase):
+
+    def setUp(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin_user)
+        # Même identifiant dans deux bases
+        self.first = self.create_transaction(self.create_user('first', 'shard01'), 'shard01')
+        self.second = self.create_transaction(self.create_user('second', 'shard02'), 'shard02')
+        self.assertEqual(self.first.pk, self.second.pk)
+        self.change_url = f'/admin/payments/paymenttransaction/{self.second.pk}/change/'
+
+    def test_changelist_links_carry_the_shard(self):
+        response = self.client.get('/admin/payments/paymenttransaction/', {'q': self.second.transaction_reference})
+
+        self.assertContains(
+            response,
+            f'{self.change_url}?_changelist_filters=q%3D{self.second.transaction_reference}&amp;shard=shard02'
+        )
+
+        response = self.client.get(self.change_url, {'shard': 'shard02'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['original'].transaction_reference, self.second.transaction_reference)
+        # Historique et suppression gardent la base
+        self.assertContains(response, 'history/?_changelist_filters=shard%3Dshard02')
+
+        response = self.client.get(
+            f'/admin/payments/paymenttransaction/{self.second.pk}/delete/',
+            {'_changelist_filters': 'shard=shard02'}
+        )
+        self.assertContains(response, self.second.transaction_reference)
+
+    def test_views_without_shard_are_rejected(self):
+        for view in ('change', 'history', 'delete'):
+            with self.subTest(view=view):
+                response = self.client.get(f'/admin/payments/paymenttransaction/{self.second.pk}/{view}/')
+                self.assertRedirects(response, '/admin/payments/paymenttransaction/')
+
+    def test_gateway_payload_names_the_shard(self):
+        payload = FlutterwavePaymentService()._build_payment_payload(self.second, self.second.user)
+
+        self.assertEqual(
+            payload['meta'],
+            {'user_id': self.second.user_id, 'transaction_id': str(self.second.pk), 'shard': 'shard02'}
+        )
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TransactionTestCase, override_settings
+
+from config.asgi import application
+from payments.events import broker
+from payments.models import PaymentTransaction
+
+Status = PaymentTransaction.TransactionStatus
+
+
+# Les vues lisent la base depuis un autre thread : données validées
+# (TransactionTestCase), sans sharding
+@override_settings(PAYMENTS_SHARDS=[])
+class TransactionStreamTestCase(TransactionTestCase):
+    reference = 'FLW-STREAM0001'
+
+    def setUp(self):
+        self.user = User.objects.create_user('customer', 'customer@example.com', 'password')
+        PaymentTransaction.objects.create(
+            user=self.user,
+            transaction_reference=self.reference,
+            amount=Decimal('10.00'),
+            status=Status.PENDING
+        )
+        self.client.force_login(self.user)
+        self.async_client.cookies = self.client.cookies
+        # Un abonné oublié par un test ne doit pas fausser les suivants
+        self.addCleanup(broker._subscribers.pop, self.reference, None)
+
+    def subscriber_count(self):
+        return len(broker._subscribers.get(self.reference, ()))
+
+    async def wait_for_subscriber(self):
+        for _ in range(100):
+            if self.subscriber_count():
+                return
+            await asyncio.sleep(0.01)
+        self.fail("Aucun abonné")
+
+    @staticmethod
+    def parse_event(chunk):
+        event, data = chunk.decode().strip().split('\n')
+        return event, json.loads(data.removeprefix('data: '))
+
+
+class TransactionEventsTests(TransactionStreamTestCase):
+
+    def url(self, reference=None):
+        return f'/api/transactions/events/{reference or self.reference}/'
+
+    async def test_unauthenticated_returns_401(self):
+        self.async_client.cookies.clear()
+
+        response = await self.async_client.get(self.url())
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.subscriber_count(), 0)
+
+    async def test_unknown_reference_returns_404(self):
+        response = await self.async_client.get(self.url('FLW-UNKNOWN'))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(json.loads(response.content)['error_code'], 'TRANSACTION_NOT_FOUND')
+        self.assertNotIn('FLW-UNKNOWN', broker._subscribers)
+
+    async def test_sends_initial_status_then_change(self):
+        response = await self.async_client.get(self.url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+
+        self.assertEqual(
+            self.parse_event(await anext(stream)),
+            ('event: status', {'transaction_reference': self.reference, 'status': Status.PENDING})
+        )
+
+        broker.dispatch(self.reference, Status.SUCCESSFUL)
+        self.assertEqual(
+            self.parse_event(await anext(stream)),
+            ('event: status', {'transaction_reference': self.reference, 'status': Status.SUCCESSFUL})
+        )
+        # Statut final : fin du flux et désabonnement
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertEqual(self.subscriber_count(), 0)
+
+    async def test_subscriber_removed_when_client_disconnects(self):
+        first_event_sent = asyncio.Event()
+        messages = []
+        cookie = f'sessionid={self.async_client.cookies["sessionid"].value}'
+
+        async def receive():
+            if not messages:
+                messages.append('request')
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # Déconnexion du client après le premier événement
+            await first_event_sent.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.body' and message.get('body'):
+                first_event_sent.set()
+
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': self.url(),
+            'raw_path': self.url().encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 12345),
+            'server': ('testserver', 80),
+        }
+        await asyncio.wait_for(application(scope, receive, send), timeout=5)
+
+        self.assertTrue(first_event_sent.is_set())
+        self.assertEqual(self.subscriber_count(), 0)
+
+
+class TransactionPollTests(TransactionStreamTestCase):
+
+    def poll(self, reference=None, **params):
+        return self.async_client.get(
+            f'/api/transactions/poll/{reference or self.reference}/', params
+        )
+
+    async def test_unauthenticated_returns_401(self):
+        self.async_client.cookies.clear()
+
+        response = await self.poll()
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.subscriber_count(), 0)
+
+    async def test_unknown_reference_returns_404(self):
+        response = await self.poll('FLW-UNKNOWN')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('FLW-UNKNOWN', broker._subscribers)
+
+    async def test_wakes_on_publish(self):
+        started_at = time.monotonic()
+        poll = asyncio.ensure_future(self.poll(status=Status.PENDING, timeout=5))
+        await self.wait_for_subscriber()
+
+        broker.dispatch(self.reference, Status.SUCCESSFUL)
+        response = await asyncio.wait_for(poll, timeout=2)
+
+        self.assertLess(time.monotonic() - started_at, 2)
+        self.assertEqual(
+            json.loads(response.content),
+            {'transaction_reference': self.reference, 'status': Status.SUCCESSFUL, 'changed': True}
+        )
+        self.assertEqual(self.subscriber_count(), 0)
+
+    async def test_times_out_without_change(self):
+        started_at = time.monotonic()
+
+        response = await self.poll(status=Status.PENDING, timeout=0.2)
+
+        self.assertGreaterEqual(time.monotonic() - started_at, 0.2)
+        self.assertEqual(
+            json.loads(response.content),
+            {'transaction_reference': self.reference, 'status': Status.PENDING, 'changed': False}
+        )
+        self.assertEqual(self.subscriber_count(), 0)
+
+    async def test_returns_immediately_when_status_differs(self):
+        response = await self.poll(status=Status.INITIATED, timeout=5)
+
+        self.assertEqual(json.loads(response.content)['changed'], True)
+        self.assertEqual(json.loads(response.content)['status'], Status.PENDING)
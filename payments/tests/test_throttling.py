@@ -0,0 +1,235 @@
+import re
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from payments import throttling
+from payments.exceptions import GatewayRateLimitError
+from payments.models import PaymentTransaction
+from payments.throttling import LocalTokenBucketStore, TokenBucketThrottle, acquire_gateway_budget, parse_rate
+
+Status = PaymentTransaction.TransactionStatus
+
+
+class FakeGatewayResponse:
+
+    def __init__(self, data, status_code=200):
+        self.status_code = status_code
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+def fake_gateway(session, method, url, json=None, **kwargs):
+    if url.endswith('/payments'):
+        return FakeGatewayResponse({
+            'status': 'success',
+            'data': {'id': 1, 'link': f'https://pay.example/{json["tx_ref"]}'}
+        })
+    flutterwave_id = re.search(r'/transactions/(\w+)/verify$', url).group(1)
+    return FakeGatewayResponse({'status': 'success', 'data': {'id': flutterwave_id, 'status': 'successful'}})
+
+
+class ThrottlingTestCase(SimpleTestCase):
+
+    def setUp(self):
+        # Horloge contrôlée et seaux neufs pour chaque test
+        self.now = 1000.0
+        clock = mock.patch('payments.throttling.time.monotonic', lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        throttling.get_store.cache_clear()
+        self.addCleanup(throttling.get_store.cache_clear)
+
+
+class ParseRateTests(SimpleTestCase):
+
+    def test_capacity_and_refill_rate(self):
+        self.assertEqual(parse_rate('30/min'), (30, 0.5))
+        self.assertEqual(parse_rate('50/s'), (50, 50))
+        self.assertEqual(parse_rate('10 / Hour'), (10, 10 / 3600))
+
+    def test_zero_negative_or_malformed_rates_are_rejected(self):
+        for rate in ('0/min', '-5/s', '30', 'abc/min', '30/week'):
+            with self.subTest(rate=rate), self.assertRaises(ImproperlyConfigured):
+                parse_rate(rate)
+
+
+class LocalTokenBucketStoreTests(ThrottlingTestCase):
+
+    def test_burst_then_refill_over_time(self):
+        store = LocalTokenBucketStore()
+        # 2 jetons, recharge d'un jeton toutes les 30 secondes
+        self.assertEqual([store.consume('key', 2, 1 / 30) for _ in range(3)], [
+            (True, 0.0), (True, 0.0), (False, 30.0)
+        ])
+
+        self.now += 15
+        allowed, wait = store.consume('key', 2, 1 / 30)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 15.0)
+
+        self.now += 15
+        self.assertEqual(store.consume('key', 2, 1 / 30), (True, 0.0))
+
+    def test_refill_is_capped_at_capacity(self):
+        store = LocalTokenBucketStore()
+        store.consume('key', 2, 1)
+        self.now += 3600
+        self.assertEqual([store.consume('key', 2, 1)[0] for _ in range(3)], [True, True, False])
+
+    def test_inactive_keys_are_evicted(self):
+        store = LocalTokenBucketStore(max_keys=2)
+        for key in ('a', 'b', 'a', 'c'):
+            store.consume(key, 1, 1)
+        self.assertEqual(list(store._buckets), ['a', 'c'])
+
+
+@override_settings(PAYMENTS_THROTTLE_RATES={'initiate': '2/min', 'verify': '1/min'})
+class TokenBucketThrottleTests(ThrottlingTestCase):
+
+    def allow(self, action, user=None, address='10.0.0.1'):
+        throttle = TokenBucketThrottle()
+        request = SimpleNamespace(
+            user=user or AnonymousUser(), META={'REMOTE_ADDR': address, 'HTTP_X_FORWARDED_FOR': None}
+        )
+        return throttle.allow_request(request, SimpleNamespace(action=action)), throttle.wait()
+
+    def test_wait_until_next_token(self):
+        self.assertEqual([self.allow('initiate') for _ in range(3)], [
+            (True, 0.0), (True, 0.0), (False, 30.0)
+        ])
+
+        self.now += 30
+        self.assertEqual(self.allow('initiate'), (True, 0.0))
+
+    def test_buckets_are_per_scope_and_per_client(self):
+        user = SimpleNamespace(pk=1, is_authenticated=True)
+        self.assertTrue(self.allow('verify', user)[0])
+        self.assertFalse(self.allow('verify', user)[0])
+
+        # Autre action, autre utilisateur, autre adresse : seaux distincts
+        self.assertTrue(self.allow('initiate', user)[0])
+        self.assertTrue(self.allow('verify', SimpleNamespace(pk=2, is_authenticated=True))[0])
+        self.assertTrue(self.allow('verify')[0])
+        self.assertFalse(self.allow('verify')[0])
+        self.assertTrue(self.allow('verify', address='10.0.0.2')[0])
+        self.assertEqual(
+            set(throttling.get_store()._buckets),
+            {
+                'throttle:verify:user:1', 'throttle:initiate:user:1', 'throttle:verify:user:2',
+                'throttle:verify:ip:10.0.0.1', 'throttle:verify:ip:10.0.0.2',
+            }
+        )
+
+    def test_actions_without_rate_are_not_limited(self):
+        for _ in range(10):
+            self.assertEqual(self.allow('list'), (True, None))
+
+    @override_settings(PAYMENTS_SHARDS=[])
+    def test_api_returns_429_with_retry_after(self):
+        client = APIClient()
+        client.force_authenticate(SimpleNamespace(pk=1, is_authenticated=True))
+
+        responses = [client.post('/api/transactions/verify/', {}, format='json') for _ in range(2)]
+
+        self.assertEqual([response.status_code for response in responses], [400, 429])
+        self.assertEqual(responses[1]['Retry-After'], '60')
+
+
+class GatewayBudgetTests(ThrottlingTestCase):
+
+    @override_settings(FLUTTERWAVE_GATEWAY_RATE='2/s')
+    def test_budget_is_exhausted_per_merchant(self):
+        acquire_gateway_budget('merchant:a')
+        acquire_gateway_budget('merchant:a')
+        with self.assertRaises(GatewayRateLimitError) as raised:
+            acquire_gateway_budget('merchant:a')
+        self.assertEqual(raised.exception.retry_after, 0.5)
+        self.assertEqual(raised.exception.status_code, 429)
+
+        acquire_gateway_budget('merchant:b')
+        self.now += 0.5
+        acquire_gateway_budget('merchant:a')
+
+
+# Sans sharding : toutes les transactions dans 'default'
+@override_settings(
+    PAYMENTS_SHARDS=[], FLUTTERWAVE_GATEWAY_RATE='1/min',
+    PAYMENTS_THROTTLE_RATES={}, FLUTTERWAVE_MAX_CONCURRENCY=1
+)
+@mock.patch('requests.Session.request', fake_gateway)
+class GatewayBudgetViewTests(TestCase):
+
+    def setUp(self):
+        throttling.get_store.cache_clear()
+        self.addCleanup(throttling.get_store.cache_clear)
+
+        self.user = User.objects.create_user('customer', 'customer@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_transaction(self, reference, flutterwave_id):
+        return PaymentTransaction.objects.create(
+            user=self.user,
+            transaction_reference=reference,
+            flutterwave_transaction_id=flutterwave_id,
+            amount=Decimal('10.00'),
+            status=Status.PENDING
+        )
+
+    def assert_rate_limited(self, response):
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.data['error_code'], 'GATEWAY_RATE_LIMITED')
+        self.assertEqual(response['Retry-After'], '60')
+
+    def test_initiate(self):
+        first = self.client.post('/api/transactions/initiate/', {'amount': '10.00'}, format='json')
+        second = self.client.post('/api/transactions/initiate/', {'amount': '10.00'}, format='json')
+
+        self.assertEqual(first.status_code, 201)
+        self.assert_rate_limited(second)
+
+    def test_initiate_batch(self):
+        response = self.client.post(
+            '/api/transactions/initiate/batch/',
+            {'payments': [{'amount': '10.00'}, {'amount': '20.00'}]},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(
+            [result.get('error_code') for result in response.data['results']],
+            [None, 'GATEWAY_RATE_LIMITED']
+        )
+
+    def test_verify_transaction(self):
+        self.create_transaction('FLW-1', '1')
+        self.create_transaction('FLW-2', '2')
+
+        first = self.client.get('/api/transactions/verify/FLW-1/')
+        second = self.client.get('/api/transactions/verify/FLW-2/')
+
+        self.assertEqual(first.status_code, 200)
+        self.assert_rate_limited(second)
+        self.assertEqual(PaymentTransaction.objects.get(transaction_reference='FLW-2').status, Status.PENDING)
+
+    def test_verify_batch(self):
+        self.create_transaction('FLW-1', '1')
+        self.create_transaction('FLW-2', '2')
+
+        response = self.client.post(
+            '/api/transactions/verify/', {'transaction_references': ['FLW-1', 'FLW-2']}, format='json'
+        )
+
+        results = response.data['results']
+        self.assertEqual(
+            sorted(result.get('error_code', result['status']) for result in results.values()),
+            ['GATEWAY_RATE_LIMITED', Status.SUCCESSFUL]
+        )
@@ -0,0 +1,177 @@
+import re
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from payments import throttling
+from payments.models import PaymentTransaction
+
+Status = PaymentTransaction.TransactionStatus
+
+# Réponse de Flutterwave selon l'identifiant de la transaction
+GATEWAY_REPLIES = {
+    '1': (200, {'status': 'success', 'data': {'status': 'successful'}}),
+    '2': (200, {'status': 'success', 'data': {'status': 'pending'}}),
+    '3': (200, {'status': 'success', 'data': {'status': 'failed'}}),
+    '5': (500, {'status': 'error', 'message': 'Internal server error'}),
+}
+
+
+class FakeGatewayResponse:
+
+    def __init__(self, data, status_code=200):
+        self.status_code = status_code
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+# Sans sharding : toutes les transactions dans 'default'
+@override_settings(PAYMENTS_SHARDS=[])
+class VerificationTestCase(TestCase):
+
+    def setUp(self):
+        throttling.get_store.cache_clear()
+        self.addCleanup(throttling.get_store.cache_clear)
+
+        self.gateway_calls = []
+        gateway_patch = mock.patch('requests.Session.request', self.fake_gateway)
+        gateway_patch.start()
+        self.addCleanup(gateway_patch.stop)
+
+        self.user = User.objects.create_user('customer', 'customer@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def fake_gateway(self, method, url, **kwargs):
+        flutterwave_id = re.search(r'/transactions/(\w+)/verify$', url).group(1)
+        self.gateway_calls.append(flutterwave_id)
+        status_code, data = GATEWAY_REPLIES[flutterwave_id]
+        return FakeGatewayResponse(data, status_code)
+
+    def create_transaction(self, reference, status, flutterwave_id=None):
+        return PaymentTransaction.objects.create(
+            user=self.user,
+            transaction_reference=reference,
+            flutterwave_transaction_id=flutterwave_id,
+            amount=Decimal('10.00'),
+            status=status
+        )
+
+    def status_of(self, reference):
+        return PaymentTransaction.objects.get(transaction_reference=reference).status
+
+
+class SingleVerificationTests(VerificationTestCase):
+
+    def verify(self, reference):
+        return self.client.get(f'/api/transactions/verify/{reference}/')
+
+    def test_successful_reply_updates_status(self):
+        self.create_transaction('FLW-OK', Status.PENDING, flutterwave_id='1')
+
+        response = self.verify('FLW-OK')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], Status.SUCCESSFUL)
+        self.assertEqual(self.status_of('FLW-OK'), Status.SUCCESSFUL)
+
+    def test_pending_reply_leaves_status_unchanged(self):
+        self.create_transaction('FLW-PENDING', Status.PENDING, flutterwave_id='2')
+
+        response = self.verify('FLW-PENDING')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.status_of('FLW-PENDING'), Status.PENDING)
+
+    def test_gateway_error_leaves_status_unchanged(self):
+        self.create_transaction('FLW-ERROR', Status.PENDING, flutterwave_id='5')
+
+        with self.assertLogs('payments', 'ERROR'):
+            response = self.verify('FLW-ERROR')
+
+        self.assertEqual(response.data['error_code'], 'Internal server error')
+        self.assertEqual(self.status_of('FLW-ERROR'), Status.PENDING)
+
+    def test_unknown_reference_returns_404(self):
+        with self.assertLogs('payments', 'ERROR'):
+            response = self.verify('FLW-UNKNOWN')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['error_code'], 'TRANSACTION_NOT_FOUND')
+
+
+class BatchVerificationTests(VerificationTestCase):
+
+    def verify(self, references):
+        return self.client.post(
+            '/api/transactions/verify/', {'transaction_references': references}, format='json'
+        )
+
+    def test_updates_statuses_and_skips_terminal_rows(self):
+        self.create_transaction('FLW-OK', Status.PENDING, flutterwave_id='1')
+        self.create_transaction('FLW-PENDING', Status.PENDING, flutterwave_id='2')
+        self.create_transaction('FLW-FAILED', Status.PENDING, flutterwave_id='3')
+        self.create_transaction('FLW-DONE', Status.SUCCESSFUL, flutterwave_id='4')
+        self.create_transaction('FLW-NO-ID', Status.INITIATED)
+
+        response = self.verify(['FLW-OK', 'FLW-PENDING', 'FLW-FAILED', 'FLW-DONE', 'FLW-NO-ID', 'FLW-UNKNOWN'])
+
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual(
+            {reference: result.get('status') for reference, result in results.items()},
+            {
+                'FLW-OK': Status.SUCCESSFUL,
+                'FLW-PENDING': Status.PENDING,
+                'FLW-FAILED': Status.FAILED,
+                'FLW-DONE': Status.SUCCESSFUL,
+                'FLW-NO-ID': Status.INITIATED,
+                'FLW-UNKNOWN': None,
+            }
+        )
+        self.assertEqual(results['FLW-UNKNOWN']['error_code'], 'TRANSACTION_NOT_FOUND')
+        # États finaux et transactions sans identifiant Flutterwave : pas d'appel
+        self.assertEqual(sorted(self.gateway_calls), ['1', '2', '3'])
+        self.assertEqual(self.status_of('FLW-FAILED'), Status.FAILED)
+        self.assertEqual(self.status_of('FLW-PENDING'), Status.PENDING)
+
+    def test_gateway_error_leaves_status_unchanged(self):
+        self.create_transaction('FLW-ERROR', Status.PENDING, flutterwave_id='5')
+
+        with self.assertLogs('payments', 'ERROR'):
+            response = self.verify(['FLW-ERROR'])
+
+        result = response.data['results']['FLW-ERROR']
+        self.assertEqual((result['status'], result['error_code']), (Status.PENDING, 'Internal server error'))
+        self.assertEqual(self.status_of('FLW-ERROR'), Status.PENDING)
+
+    def test_batch_is_loaded_with_one_query(self):
+        for index in range(5):
+            self.create_transaction(f'FLW-{index}', Status.PENDING, flutterwave_id='1')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.verify([f'FLW-{index}' for index in range(5)])
+
+        self.assertEqual(response.status_code, 200)
+        selects = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "payments_paymenttransaction"' in query['sql']
+        ]
+        self.assertEqual(len(selects), 1)
+
+    def test_batch_over_max_size_is_rejected(self):
+        references = [f'FLW-{index}' for index in range(settings.PAYMENT_VERIFY_BATCH_MAX_SIZE + 1)]
+
+        response = self.verify(references)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('transaction_references', response.data)
+        self.assertEqual(self.gateway_calls, [])
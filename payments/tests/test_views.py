@@ -0,0 +1,92 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from payments.exceptions import GatewayRateLimitError
+from payments.models import PaymentTransaction
+from payments.sharding import get_user_shard
+
+
+class RefundViewTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.payment_transaction = PaymentTransaction.objects.create(
+            user=self.admin,
+            transaction_reference='FLW-REFUND0001',
+            flutterwave_transaction_id='1',
+            amount=Decimal('10.00'),
+            status=PaymentTransaction.TransactionStatus.SUCCESSFUL
+        )
+
+    def test_gateway_rate_limit_returns_429_with_retry_after(self):
+        with mock.patch(
+            'payments.services.acquire_gateway_budget',
+            side_effect=GatewayRateLimitError("Trop d'appels", retry_after=1.2)
+        ):
+            response = self.client.post(f'/api/transactions/{self.payment_transaction.pk}/refund/', {})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '2')
+        self.assertEqual(response.data['error_code'], 'GATEWAY_RATE_LIMITED')
+
+
+class TransactionDetailViewTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = User.objects.create_user('customer', 'customer@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.payment_transaction = PaymentTransaction.objects.create(
+            user=self.user,
+            transaction_reference='FLW-DETAIL0001',
+            amount=Decimal('10.00')
+        )
+
+    def test_non_numeric_id_returns_404(self):
+        response = self.client.get('/api/transactions/abc/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_etag_returns_304(self):
+        url = f'/api/transactions/{self.payment_transaction.pk}/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class TransactionListViewTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = User.objects.create_user('customer', 'customer@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        PaymentTransaction.objects.using(get_user_shard(self.user.pk, assign=True)).create(
+            user=self.user,
+            transaction_reference='FLW-LIST0001',
+            amount=Decimal('10.00')
+        )
+
+    def test_etag_aggregate_counts_rows(self):
+        connection = connections[get_user_shard(self.user.pk)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/transactions/')
+
+        self.assertEqual(response.status_code, 200)
+        # COUNT(*) : pas de lecture de la colonne id, l'index suffit
+        aggregate = next(query['sql'] for query in queries.captured_queries if 'MAX(' in query['sql'])
+        self.assertIn('COUNT(*)', aggregate)
+
+        response = self.client.get('/api/transactions/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
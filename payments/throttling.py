@@ -0,0 +1,188 @@
+"""
+Limitation de débit par seau à jetons (token bucket).
+
+- TokenBucketThrottle : par utilisateur et par action du
+  PaymentTransactionViewSet (settings.PAYMENTS_THROTTLE_RATES).
+- acquire_gateway_budget : budget des appels sortants vers Flutterwave
+  (settings.FLUTTERWAVE_GATEWAY_RATE) par marchand, partagé par tous les
+  processus.
+
+L'état est mis à jour atomiquement dans Redis (script Lua) lorsque
+PAYMENTS_THROTTLE_REDIS_URL est défini, sinon (ou si Redis est indisponible)
+dans la mémoire du processus.
+"""
+import logging
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+from payments.exceptions import GatewayRateLimitError
+
+logger = logging.getLogger('payments')
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """
+    Convertit '30/min' en (capacité, jetons par seconde).
+
+    Raises:
+        ImproperlyConfigured: Taux mal formé, ou nombre de requêtes nul ou négatif
+    """
+    try:
+        count, period = rate.split('/')
+        count = int(count)
+        seconds = PERIODS[period.strip().lower()]
+    except (ValueError, KeyError) as exc:
+        raise ImproperlyConfigured(f"Taux invalide: {rate!r}") from exc
+    if count <= 0:
+        # Aucune recharge possible : le seau ne se remplirait jamais
+        raise ImproperlyConfigured(f"Taux invalide: {rate!r} (le nombre doit être positif)")
+    return count, count / seconds
+
+
+class LocalTokenBucketStore:
+    """Seaux en mémoire du processus, nombre de clés borné."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate, cost=1):
+        """
+        Retire ``cost`` jetons du seau si possible.
+
+        Returns:
+            tuple: (autorisé, secondes à attendre avant le prochain essai)
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / refill_rate
+
+            # Réinsertion en fin de dictionnaire : les clés inactives sont évincées en premier
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                del self._buckets[next(iter(self._buckets))]
+        return wait == 0.0, wait
+
+
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * refill_rate)
+
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / refill_rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / refill_rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisTokenBucketStore:
+    """
+    Seaux partagés dans Redis : lecture, recharge et consommation en un seul
+    script Lua, donc sans condition de course entre processus.
+    """
+
+    def __init__(self, url, fallback):
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured(
+                "PAYMENTS_THROTTLE_REDIS_URL nécessite le paquet 'redis'"
+            ) from exc
+        self._errors = redis.RedisError
+        client = redis.Redis.from_url(url, socket_timeout=0.1, socket_connect_timeout=0.1)
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._fallback = fallback
+
+    def consume(self, key, capacity, refill_rate, cost=1):
+        try:
+            wait = float(self._script(keys=[key], args=[capacity, refill_rate, cost]))
+        except self._errors:
+            logger.error(
+                "Stockage des limites indisponible, repli en mémoire",
+                extra={'error_code': 'THROTTLE_STORE_UNAVAILABLE'}
+            )
+            return self._fallback.consume(key, capacity, refill_rate, cost)
+        return wait == 0.0, wait
+
+
+@lru_cache(maxsize=None)
+def get_store():
+    local_store = LocalTokenBucketStore()
+    if settings.PAYMENTS_THROTTLE_REDIS_URL:
+        return RedisTokenBucketStore(settings.PAYMENTS_THROTTLE_REDIS_URL, local_store)
+    return local_store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Limite chaque utilisateur (ou adresse IP) par action, selon
+    settings.PAYMENTS_THROTTLE_RATES. Les actions sans taux ne sont pas limitées.
+    DRF renvoie un 429 avec l'en-tête Retry-After.
+    """
+
+    def __init__(self):
+        self._wait = None
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'action', None)
+        rate = settings.PAYMENTS_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+
+        if request.user and request.user.is_authenticated:
+            ident = f"user:{request.user.pk}"
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+
+        capacity, refill_rate = parse_rate(rate)
+        allowed, self._wait = get_store().consume(
+            f"throttle:{scope}:{ident}", capacity, refill_rate
+        )
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+def acquire_gateway_budget(scope='default'):
+    """
+    Consomme un jeton du budget d'appels vers Flutterwave du marchand ``scope``.
+
+    Raises:
+        GatewayRateLimitError: Budget épuisé (avec le délai d'attente conseillé)
+    """
+    capacity, refill_rate = parse_rate(settings.FLUTTERWAVE_GATEWAY_RATE)
+    allowed, wait = get_store().consume(f"throttle:gateway:{scope}", capacity, refill_rate)
+    if not allowed:
+        raise GatewayRateLimitError(
+            "Trop d'appels vers Flutterwave, réessayez plus tard",
+            retry_after=wait
+        )
@@ -1,10 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from payments.views import PaymentTransactionViewSet
+from payments.streams import transaction_events, transaction_poll
 
 router = DefaultRouter()
 router.register(r'transactions', PaymentTransactionViewSet, basename='payment-transaction')
 
 urlpatterns = [
+    path('transactions/events/<str:transaction_reference>/', transaction_events, name='payment-transaction-events'),
+    path('transactions/poll/<str:transaction_reference>/', transaction_poll, name='payment-transaction-poll'),
     path('', include(router.urls)),
 ]
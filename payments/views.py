@@ -1,5 +1,11 @@
 
 # payments/viewsets.py
+import hashlib
+import math
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -9,10 +15,14 @@ from .models import PaymentTransaction
 from .serializers import (
     PaymentTransactionSerializer, 
     PaymentInitiationSerializer,
+    BatchPaymentInitiationSerializer,
+    BatchVerificationSerializer,
     RefundSerializer
 )
 from .services import FlutterwavePaymentService
+from .sharding import get_user_shard
 from .exceptions import PaymentException
+from .throttling import TokenBucketThrottle
 
 class PaymentTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -23,12 +33,85 @@ class PaymentTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status', 'currency', 'created_at']
+    throttle_classes = [TokenBucketThrottle]
     
     def get_queryset(self):
         """
         Limite les résultats aux transactions de l'utilisateur connecté
         """
-        return PaymentTransaction.objects.filter(user=self.request.user)
+        if getattr(self, 'swagger_fake_view', False):
+            # Génération du schéma OpenAPI, sans requête réelle
+            return PaymentTransaction.objects.none()
+        # Base (shard) des transactions de l'utilisateur ; utilisateur et
+        # marchand sont dans 'default', donc chargés à part (pas de jointure)
+        return PaymentTransaction.objects.using(
+            get_user_shard(self.request.user.pk)
+        ).filter(user=self.request.user).prefetch_related('user', 'merchant')
+
+    def list(self, request, *args, **kwargs):
+        """
+        Liste avec requêtes conditionnelles : l'ETag vient de max(updated_at),
+        du nombre de lignes et des paramètres de filtre, sans sérialiser la
+        réponse (index payment_user_updated_idx).
+        """
+        state = self.filter_queryset(self.get_queryset()).aggregate(
+            last_modified=Max('updated_at'),
+            count=Count('*')
+        )
+        etag = self._make_etag(
+            request.user.pk,
+            state['count'],
+            state['last_modified'],
+            sorted(request.query_params.lists())
+        )
+        return self._conditional_response(
+            request, etag, state['last_modified'],
+            lambda: super(PaymentTransactionViewSet, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Détail avec requêtes conditionnelles : l'ETag vient de updated_at.
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            last_modified = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            ).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError, ValidationError):
+            # Identifiant invalide (ex. non numérique)
+            last_modified = None
+        if last_modified is None:
+            # Transaction introuvable : 404 habituel
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = self._make_etag(request.user.pk, kwargs[lookup_url_kwarg], last_modified)
+        return self._conditional_response(
+            request, etag, last_modified,
+            lambda: super(PaymentTransactionViewSet, self).retrieve(request, *args, **kwargs)
+        )
+
+    @staticmethod
+    def _make_etag(*parts):
+        return '"%s"' % hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+    def _conditional_response(self, request, etag, last_modified, get_response):
+        """
+        Renvoie 304 si If-None-Match / If-Modified-Since correspondent, sinon
+        la réponse normale avec ETag et Last-Modified.
+        """
+        last_modified_timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified_timestamp
+        )
+        if response is None:
+            response = get_response()
+        response['ETag'] = etag
+        if last_modified_timestamp is not None:
+            response['Last-Modified'] = http_date(last_modified_timestamp)
+        # Le client doit revalider à chaque fois ; réponse propre à l'utilisateur
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
     
     @action(
         detail=False, 
@@ -51,18 +134,40 @@ class PaymentTransactionViewSet(viewsets.ReadOnlyModelViewSet):
                 currency=serializer.validated_data.get('currency', 'USD'),
                 customer_details={
                     'email': serializer.validated_data.get('customer_email')
-                }
+                },
+                merchant=serializer.validated_data.get('merchant')
             )
             return Response(payment_data, status=status.HTTP_201_CREATED)
         
         except PaymentException as e:
-            return Response(
-                {
-                    "error": e.message,
-                    "error_code": e.error_code
-                }, 
-                status=e.status_code
-            )
+            return self._payment_error_response(e)
+    
+    @action(
+        detail=False, 
+        methods=['POST'], 
+        url_path='initiate/batch',
+        serializer_class=BatchPaymentInitiationSerializer
+    )
+    def initiate_batch(self, request):
+        """
+        Action personnalisée pour initier plusieurs paiements en une requête.
+        Retourne un résultat par paiement (207 si certains ont échoué).
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        payment_service = FlutterwavePaymentService()
+        results = payment_service.initiate_payments_batch(
+            user=request.user,
+            payments=serializer.validated_data['payments']
+        )
+        
+        response_status = (
+            status.HTTP_207_MULTI_STATUS
+            if any('error' in result for result in results)
+            else status.HTTP_201_CREATED
+        )
+        return Response({"results": results}, status=response_status)
     
     @action(
         detail=False, 
@@ -80,13 +185,37 @@ class PaymentTransactionViewSet(viewsets.ReadOnlyModelViewSet):
             return Response(verification_result, status=status.HTTP_200_OK)
         
         except PaymentException as e:
-            return Response(
-                {
-                    "error": e.message,
-                    "error_code": e.error_code
-                }, 
-                status=e.status_code
-            )
+            return self._payment_error_response(e)
+    
+    @action(
+        detail=False, 
+        methods=['POST'], 
+        serializer_class=BatchVerificationSerializer
+    )
+    def verify(self, request):
+        """
+        Action personnalisée pour vérifier plusieurs transactions en une requête.
+        Les résultats sont indexés par référence de transaction.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        references = list(dict.fromkeys(serializer.validated_data['transaction_references']))
+        transactions = self.get_queryset().filter(transaction_reference__in=references)
+        
+        payment_service = FlutterwavePaymentService()
+        results = payment_service.verify_transactions(transactions)
+        
+        not_found = {
+            "error": "Transaction introuvable",
+            "error_code": 'TRANSACTION_NOT_FOUND'
+        }
+        results = {
+            reference: results.get(reference, {"transaction_reference": reference, **not_found})
+            for reference in references
+        }
+        
+        return Response({"results": results}, status=status.HTTP_200_OK)
     
     @action(
         detail=True, 
@@ -117,14 +246,24 @@ class PaymentTransactionViewSet(viewsets.ReadOnlyModelViewSet):
             
             return Response(refund_result, status=status.HTTP_200_OK)
         
-        except RefundException as e:
-            return Response(
-                {
-                    "error": e.message,
-                    "error_code": e.error_code
-                }, 
-                status=e.status_code
-            )
+        except PaymentException as e:
+            return self._payment_error_response(e)
+    
+    def _payment_error_response(self, e):
+        """
+        Réponse d'erreur commune ; ajoute Retry-After si Flutterwave est saturé
+        """
+        response = Response(
+            {
+                "error": e.message,
+                "error_code": e.error_code
+            }, 
+            status=e.status_code
+        )
+        retry_after = getattr(e, 'retry_after', None)
+        if retry_after is not None:
+            response['Retry-After'] = str(math.ceil(retry_after))
+        return response
     
     def get_permissions(self):
         """